@@ -27,6 +27,8 @@ cache_directory = config['Cache']['Directory']
 max_cache_age_hours = int(config['Cache']['MaxAgeHours'])
 cache_file = config['Cache']['DailyCacheFile']
 weekly_cache_file = config['Cache']['WeeklyCacheFile']
+seen_index_file = config.get('Cache', 'SeenIndexFile', fallback='cache/seen_index.pkl')
+alternates_file = config.get('Cache', 'AlternatesFile', fallback='cache/alternates.pkl')
 
 
 max_summary_length = int(config['Summaries']['MaxSummaryLength'])
@@ -35,6 +37,9 @@ max_cache_age_hours = int(config['Summaries']['MaxCacheAgeHours'])
 categories = config['Headlines']['Categories'].split(', ')
 
 use_tqdm = config.getboolean('General', 'UseTqdm')
+concurrent_scrape = config.getboolean('Scraper', 'Concurrent', fallback=True)
+incremental_runs = config.getboolean('General', 'IncrementalRuns', fallback=False)
+streaming_pipeline = config.getboolean('Pipeline', 'Enabled', fallback=False)
 
 model_categorize_headlines = config['Models']['CategorizeHeadlines']
 model_summarize_super_summary = config['Models']['SummarizeSuperSummary']
@@ -90,6 +95,10 @@ from modules import ftp_uploader
 from modules import sum_summaries
 from modules import locations
 from modules import similarity
+from modules import dedup
+from modules import pipeline
+from modules import near_dupes
+from modules import model_registry
 
 
 app = Flask(__name__)
@@ -102,44 +111,125 @@ def format_datetime(value, fmt='%Y-%m-%d %H:%M:%S'):
 
 app.jinja_env.filters['strftime'] = format_datetime
 
+def load_alternates():
+    if os.path.exists(alternates_file):
+        try:
+            return cache_files.load_cache(alternates_file)
+        except Exception as e:
+            print(f"Error while loading alternates: {e}")
+    return {}
+
+def scrape_sources(alternates, near_duplicate_index=None):
+    # Initialize an empty list for all_headlines
+    all_headlines = []
+
+    if concurrent_scrape:
+        print(f"Scraping headlines from {len(sources)} sources concurrently")
+        all_headlines = scraper.scrape_all_headlines(sources)
+        print(f"Finished scraping {len(all_headlines)} headlines\n")
+    else:
+        # Iterate over the sources
+        for i, (source, num_articles) in enumerate(sources):
+            print(f"Scraping headlines from source {i + 1}/{len(sources)}: {source}")
+            headlines = scraper.scrape_headlines(source, num_articles)
+            all_headlines.extend(headlines)
+            print(f"Finished scraping headlines from source {i + 1}/{len(sources)}: {source}\n")
+
+    # Drop the same story arriving from several sources before it is classified,
+    # near-identical wire copies are kept as alternates of the first one
+    all_headlines = dedup.dedup_headlines(all_headlines)
+    return near_dupes.collapse_near_duplicates(all_headlines, near_duplicate_index, alternates)
+
 def main():
     print("Running NewsPlanetAi System...")
     if not os.path.exists(cache_directory):
         os.makedirs(cache_directory)
 
-    if cache_files.is_cache_valid(cache_file, max_cache_age=max_cache_age_hours):
+    seen_index = cache_files.load_seen_index(seen_index_file) if incremental_runs else None
+
+    # The similarity model is also used by the local headline classifier
+    print("Loading model")
+    model = SentenceTransformer(SimilarityModel)
+
+    alternates = {}
+    # Incremental runs always scrape, they only skip the headlines already summarized today
+    if not incremental_runs and cache_files.is_cache_valid(cache_file, max_cache_age=max_cache_age_hours):
         try:
             summaries = cache_files.load_cache(cache_file)
         except Exception as e:
             print(f"Error while loading cache: {e}")
             summaries = []
+        alternates = load_alternates()
+    elif incremental_runs:
+        # Only headlines not seen earlier today are classified and summarized,
+        # the results are appended to the day's existing summaries
+        summaries = []
+        if seen_index['entries'] and os.path.exists(cache_file):
+            try:
+                summaries = cache_files.load_cache(cache_file)
+            except Exception as e:
+                print(f"Error while loading cache: {e}")
+            alternates = load_alternates()
+
+        def is_new(headline):
+            return headline[1] not in seen_index['entries']
+
+        # Wire copies of stories summarized earlier today collapse onto them instead of being summarized again
+        near_duplicate_index = near_dupes.index_articles([summary[3] for summary in summaries])
+
+        if streaming_pipeline:
+            new_summaries = pipeline.run_pipeline(sources, retries_summarize_articles, wait_time_seconds_summarize_articles, accept=is_new, model=model, alternates=alternates, near_duplicate_index=near_duplicate_index)
+        else:
+            all_headlines = scrape_sources(alternates, near_duplicate_index)
+            new_headlines = [headline for headline in all_headlines if is_new(headline)]
+            print(f"{len(new_headlines)} new headlines out of {len(all_headlines)}")
+
+            categorized_headlines = classifier.categorize_headlines(new_headlines, model=model)
+            new_summaries = summarizer.summarize_articles(categorized_headlines, retries_summarize_articles, wait_time_seconds_summarize_articles)
+        # Only articles that were summarized count as seen, failed ones are tried again next run
+        for summary in new_summaries:
+            seen_index['entries'].setdefault(summary[3], {})
+        summaries = summaries + new_summaries
+        cache_files.save_cache(cache_file, summaries)
+        cache_files.save_cache(alternates_file, alternates)
+        cache_files.save_seen_index(seen_index, seen_index_file)
+    elif streaming_pipeline:
+        summaries = pipeline.run_pipeline(sources, retries_summarize_articles, wait_time_seconds_summarize_articles, model=model, alternates=alternates)
+        cache_files.save_cache(cache_file, summaries)
+        cache_files.save_cache(alternates_file, alternates)
     else:
-        # Initialize an empty list for all_headlines
-        all_headlines = []
-
-        # Iterate over the sources
-        for i, (source, num_articles) in enumerate(sources):
-            print(f"Scraping headlines from source {i + 1}/{len(sources)}: {source}")
-            headlines = scraper.scrape_headlines(source, num_articles)
-            all_headlines.extend(headlines)
-            print(f"Finished scraping headlines from source {i + 1}/{len(sources)}: {source}\n")
-
-        categorized_headlines = classifier.categorize_headlines(all_headlines)
+        all_headlines = scrape_sources(alternates)
+        categorized_headlines = classifier.categorize_headlines(all_headlines, model=model)
         summaries = summarizer.summarize_articles(categorized_headlines, retries_summarize_articles, wait_time_seconds_summarize_articles)
         cache_files.save_cache(cache_file, summaries)
+        cache_files.save_cache(alternates_file, alternates)
 
     # Generate top articles by category
     print("Grouping summaries by category")
     summaries_by_categories = similarity.group_by_category(summaries)
-    print("Loading model")
-    model = SentenceTransformer(SimilarityModel)
     print("Generating top articles by category")
     top_articles_by_category = similarity.generate_top_articles_by_category(summaries_by_categories, model, SIMILARITY_THRESHOLD, TOP_N_ARTICLES)
 
     # Extract locations and get coordinates
-    extracted_locations = locations.extract_locations(summaries)
+    if incremental_runs:
+        # Locations found earlier today are kept in the seen index
+        entries = seen_index['entries']
+        new_summaries = [summary for summary in summaries if 'location' not in entries.get(summary[3], {})]
+        new_locations = locations.extract_locations(new_summaries)
+        new_coordinates = locations.get_coordinates(new_locations)
+        found = {}
+        for summary, location, coords in zip(new_summaries, new_locations, new_coordinates):
+            found[summary[3]] = {'location': location, 'coordinates': coords}
+            # Failed extractions are not recorded, so the next run tries them again
+            if location is not None:
+                entries[summary[3]] = found[summary[3]]
+        cache_files.save_seen_index(seen_index, seen_index_file)
+        extracted_locations = [found.get(summary[3], entries.get(summary[3], {})).get('location') for summary in summaries]
+        coordinates = [found.get(summary[3], entries.get(summary[3], {})).get('coordinates') for summary in summaries]
+    else:
+        extracted_locations = locations.extract_locations(summaries)
+        coordinates = locations.get_coordinates(extracted_locations) # Get coordinates
     print(len(summaries))
-    coordinates = locations.get_coordinates(extracted_locations) # Get coordinates
     print(len(extracted_locations))
     geojson_data, geojson_file_name = locations.generate_geojson(summaries, extracted_locations, coordinates)
     print(len(coordinates))
@@ -169,6 +259,7 @@ def main():
 
     # Get the summarized summaries from the daily cache
     summarized_summaries = summarizer.summarize_daily_cache(cache_file)
+    model_registry.release_if_memory_low()
 
     # Generate the news broadcast script
     super_summary_text = sum_summaries.get_or_generate_super_summary(top_article_for_gpt, summarized_summaries)
@@ -194,7 +285,8 @@ def main():
                 "source": summary[4],
                 "location": summary[5] if summary[5] is not None else "None",
                 "coordinates": list(summary[6]) if summary[6] is not None else [None, None],
-                "top_headline": False  # Default value
+                "top_headline": False,  # Default value
+                "alternates": [{"headline": title, "link": link, "source": source} for title, link, source in alternates.get(summary[2], [])]
             }
 
             # Check if the summary is a top article
@@ -0,0 +1,95 @@
+import argparse
+import os
+import pickle
+import re
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules import model_registry
+
+
+def load_texts(cache_file, limit):
+    """Load article summaries from a daily cache file (a list of summary tuples)."""
+    with open(cache_file, 'rb') as f:
+        daily_cache = pickle.load(f)
+    texts = [summary[2] for summary in daily_cache if summary[2]]
+    return texts[:limit] if limit else texts
+
+
+def _tokens(text):
+    return re.findall(r'\w+', text.lower())
+
+
+def _f1(overlap, candidate_length, reference_length):
+    if not overlap:
+        return 0.0
+    precision = overlap / candidate_length
+    recall = overlap / reference_length
+    return 2 * precision * recall / (precision + recall)
+
+
+def rouge_1(candidate, reference):
+    candidate, reference = _tokens(candidate), _tokens(reference)
+    counts = {}
+    for token in reference:
+        counts[token] = counts.get(token, 0) + 1
+    overlap = 0
+    for token in candidate:
+        if counts.get(token, 0) > 0:
+            counts[token] -= 1
+            overlap += 1
+    return _f1(overlap, len(candidate), len(reference))
+
+
+def rouge_l(candidate, reference):
+    candidate, reference = _tokens(candidate), _tokens(reference)
+    # Longest common subsequence, one row at a time
+    previous = [0] * (len(reference) + 1)
+    for token in candidate:
+        current = [0]
+        for j, reference_token in enumerate(reference):
+            current.append(previous[j] + 1 if token == reference_token else max(previous[j + 1], current[j]))
+        previous = current
+    return _f1(previous[-1], len(candidate), len(reference))
+
+
+def run_backend(texts, backend, max_batch_tokens):
+    # Load outside the timed section so only inference is measured
+    model_registry.get_summarizer(backend=backend)
+    start = time.perf_counter()
+    summaries = model_registry.summarize_batched(texts, backend=backend, max_batch_tokens=max_batch_tokens, max_length=45, min_length=10, do_sample=False)
+    elapsed = time.perf_counter() - start
+    model_registry.release()
+    return summaries, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare BART summarization backends on the daily cache.")
+    parser.add_argument('--cache-file', default='cache/daily_summaries.p')
+    parser.add_argument('--limit', type=int, default=100, help="Number of articles to summarize, 0 for all")
+    parser.add_argument('--backends', nargs='+', default=list(model_registry.BACKENDS), choices=model_registry.BACKENDS)
+    parser.add_argument('--max-batch-tokens', type=int, default=model_registry.max_batch_tokens)
+    args = parser.parse_args()
+
+    texts = load_texts(args.cache_file, args.limit)
+    print(f"Benchmarking {len(texts)} articles")
+
+    # The fp32 pytorch backend is the reference for ROUGE drift
+    baseline, baseline_elapsed = run_backend(texts, 'pytorch', args.max_batch_tokens)
+    results = [('pytorch', baseline_elapsed, 1.0, 1.0)]
+    for backend in args.backends:
+        if backend == 'pytorch':
+            continue
+        summaries, elapsed = run_backend(texts, backend, args.max_batch_tokens)
+        r1 = sum(rouge_1(summary, reference) for summary, reference in zip(summaries, baseline)) / len(texts)
+        rl = sum(rouge_l(summary, reference) for summary, reference in zip(summaries, baseline)) / len(texts)
+        results.append((backend, elapsed, r1, rl))
+
+    print(f"\n{'backend':<10} {'articles/s':>10} {'speedup':>8} {'ROUGE-1':>8} {'ROUGE-L':>8}")
+    for backend, elapsed, r1, rl in results:
+        print(f"{backend:<10} {len(texts) / elapsed:>10.2f} {baseline_elapsed / elapsed:>7.2f}x {r1:>8.3f} {rl:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
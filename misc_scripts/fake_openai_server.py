@@ -0,0 +1,170 @@
+"""
+Local stand-in for the OpenAI chat completions API, for load testing the pipeline.
+
+Point [OPENAI] ApiBase at http://127.0.0.1:8000/v1 to send every module's
+requests here. Latency is log-normal and a share of requests fail with 429 or
+503 so robust_api_call's retry behaviour can be exercised. The server also
+serves synthetic RSS feeds and article pages for misc_scripts/load_test.py.
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from flask import Flask, Response, jsonify, request
+
+app = Flask(__name__)
+settings = argparse.Namespace(latency_median=0.8, latency_sigma=0.5, rate_limit_rate=0.02, error_rate=0.01, retry_after=2)
+
+stats = {}
+stats_lock = threading.Lock()
+
+WORDS = ("government minister election market economy conflict agreement storm climate court police "
+         "company report talks border energy health vote city protest trade summit crisis rescue "
+         "officials analysts investors council military coast research technology announced said "
+         "week monday people country region talks growth prices inflation industry workers").split()
+LOCATIONS = ["Paris, France", "Kyiv, Ukraine", "Tokyo, Japan", "Washington, United States", "Nairobi, Kenya", "None"]
+
+
+def reset_stats():
+    with stats_lock:
+        stats.clear()
+        stats.update(requests=0, completed=0, rate_limited=0, server_errors=0, prompt_tokens=0, completion_tokens=0, started=time.time())
+
+
+def _count_tokens(text):
+    return int(len(text.split()) * 4 / 3)
+
+
+def _words(count, seed):
+    rng = random.Random(seed)
+    return ' '.join(rng.choice(WORDS) for _ in range(count))
+
+
+def _sentences(count, seed):
+    # Goose keeps paragraphs by their stopword count, so article text needs the small words of real prose
+    rng = random.Random(seed)
+    return ' '.join(
+        f"The {rng.choice(WORDS)} said that the {rng.choice(WORDS)} would be {rng.choice(WORDS)} in the {rng.choice(WORDS)} "
+        f"after {rng.choice(WORDS)} and {rng.choice(WORDS)} were {rng.choice(WORDS)} on {rng.choice(WORDS)}."
+        for _ in range(count)
+    )
+
+
+def _categories(system_message):
+    match = re.search(r'single category: (.*?)\. ', system_message)
+    return match.group(1).split(', ') if match else ["World News"]
+
+
+def _completion(body):
+    messages = body.get('messages', [])
+    system_message = next((m['content'] for m in messages if m['role'] == 'system'), '')
+    user_message = messages[-1]['content'] if messages else ''
+    is_location = 'location' in system_message.lower()
+
+    if body.get('response_format', {}).get('type') == 'json_object':
+        # Batched requests number their items "0: ...", answer one value per number
+        indices = re.findall(r'^(\d+):', user_message, flags=re.MULTILINE)
+        choices = LOCATIONS if is_location else _categories(system_message)
+        return json.dumps({index: random.choice(choices) for index in indices})
+    if is_location:
+        return random.choice(LOCATIONS)
+    if system_message.startswith('Classify'):
+        return random.choice(_categories(system_message))
+    length = int(body.get('max_tokens', 256) * 0.75)
+    return _words(length, user_message)
+
+
+@app.route('/v1/chat/completions', methods=['POST'])
+def chat_completions():
+    body = request.get_json(force=True)
+    prompt_tokens = sum(_count_tokens(str(m.get('content', ''))) for m in body.get('messages', []))
+    with stats_lock:
+        stats['requests'] += 1
+
+    time.sleep(random.lognormvariate(math.log(settings.latency_median), settings.latency_sigma))
+
+    roll = random.random()
+    if roll < settings.rate_limit_rate:
+        with stats_lock:
+            stats['rate_limited'] += 1
+        error = {"error": {"message": "Rate limit reached (simulated)", "type": "requests", "param": None, "code": "rate_limit_exceeded"}}
+        return jsonify(error), 429, {'Retry-After': str(settings.retry_after)}
+    if roll < settings.rate_limit_rate + settings.error_rate:
+        with stats_lock:
+            stats['server_errors'] += 1
+        error = {"error": {"message": "The server is overloaded (simulated)", "type": "server_error", "param": None, "code": None}}
+        return jsonify(error), 503
+
+    content = _completion(body)
+    completion_tokens = _count_tokens(content)
+    with stats_lock:
+        stats['completed'] += 1
+        stats['prompt_tokens'] += prompt_tokens
+        stats['completion_tokens'] += completion_tokens
+    return jsonify({
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get('model'),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens},
+    })
+
+
+@app.route('/stats', methods=['GET'])
+def get_stats():
+    with stats_lock:
+        return jsonify(dict(stats, elapsed=time.time() - stats['started']))
+
+
+@app.route('/stats/reset', methods=['POST'])
+def post_stats_reset():
+    reset_stats()
+    return jsonify(ok=True)
+
+
+@app.route('/feeds/<run>/<int:feed>.xml')
+def feed(run, feed):
+    count = request.args.get('articles', 50, type=int)
+    items = []
+    for i in range(count):
+        article_id = f"{feed}-{i}"
+        items.append(
+            f"<item><title>Synthetic story {run} {article_id} {_words(6, run + article_id)}</title>"
+            f"<link>{request.host_url}articles/{run}/{article_id}</link>"
+            f"<guid>{run}-{article_id}</guid>"
+            f"<pubDate>{time.strftime('%a, %d %b %Y %H:%M:%S +0000', time.gmtime())}</pubDate></item>"
+        )
+    xml = f"<?xml version='1.0'?><rss version='2.0'><channel><title>Synthetic feed {feed}</title>{''.join(items)}</channel></rss>"
+    return Response(xml, mimetype='application/rss+xml')
+
+
+@app.route('/articles/<run>/<article_id>')
+def article(run, article_id):
+    # Every article gets different text so none of them are collapsed as duplicates
+    paragraphs = ''.join(f"<p>{_sentences(5, f'{run}-{article_id}-{i}')}</p>" for i in range(6))
+    return f"<html><head><title>Synthetic story {article_id}</title></head><body><article><h1>Synthetic story {article_id}</h1>{paragraphs}</article></body></html>"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI chat completions server for load testing.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency-median', type=float, default=settings.latency_median, help="Median response latency in seconds")
+    parser.add_argument('--latency-sigma', type=float, default=settings.latency_sigma, help="Log-normal sigma of the latency")
+    parser.add_argument('--rate-limit-rate', type=float, default=settings.rate_limit_rate, help="Share of requests answered with 429")
+    parser.add_argument('--error-rate', type=float, default=settings.error_rate, help="Share of requests answered with 503")
+    parser.add_argument('--retry-after', type=int, default=settings.retry_after, help="Retry-After seconds sent with 429s")
+    args = parser.parse_args()
+    vars(settings).update({key: value for key, value in vars(args).items() if key not in ('host', 'port')})
+
+    reset_stats()
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Drive main.main with synthetic articles against misc_scripts/fake_openai_server.py.
+
+Run from the repository root with [OPENAI] ApiBase pointing at the fake
+server. The run works inside a temporary directory: news.json, GeoJSON, super
+summaries and every cache (daily, weekly, seen index, feed state, article,
+classification, summary, location, condensed, centroid and LLM response
+caches) are written there, so production data is never touched. FTP uploads
+and geocoding are skipped, and so is the BART daily summary unless asked for.
+"""
+import argparse
+import functools
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main as newsplanet
+from modules import (article_cache, cache_files, classifier, condensed_cache, ftp_uploader, llm_cache,
+                     local_classifier, locations, scraper, summarizer, super_summary)
+
+ARTICLES_PER_FEED = 50
+
+
+def isolate(work_directory):
+    """Point every file the run writes at work_directory and make it the working directory."""
+    def path(name):
+        return os.path.join(work_directory, 'cache', name)
+
+    os.makedirs(os.path.join(work_directory, 'modules'))
+    # sum_summaries lists this directory for a recent broadcast and expects it to exist
+    os.makedirs(os.path.join(work_directory, 'super_summaries'))
+    # Some modules read the config again at run time through the relative path
+    shutil.copy('modules/suite_config.ini', os.path.join(work_directory, 'modules', 'suite_config.ini'))
+
+    newsplanet.cache_directory = os.path.join(work_directory, 'cache')
+    newsplanet.cache_file = summarizer.cache_file = super_summary.cache_file = path('daily_summaries.p')
+    newsplanet.weekly_cache_file = path('weekly_cache.pkl')
+    newsplanet.seen_index_file = path('seen_index.pkl')
+    newsplanet.alternates_file = path('alternates.pkl')
+    article_cache.cache_directory = path('articles')
+    classifier.classification_cache_file = path('classification_cache.pkl')
+    summarizer.summary_cache_file = path('summary_cache.pkl')
+    locations.CACHE_FILE = path('locations.pkl')
+    llm_cache.cache_file = path('llm_cache.sqlite')
+    local_classifier.SELF_LABELLED_FILE = path('local_labels.pkl')
+    # These take their file as a default argument, bound when the module was imported
+    scraper.load_feed_state = functools.partial(scraper.load_feed_state, path('feed_state.pkl'))
+    scraper.save_feed_state = functools.partial(scraper.save_feed_state, filename=path('feed_state.pkl'))
+    condensed_cache.load_condensed_cache = functools.partial(condensed_cache.load_condensed_cache, path('condensed_summaries.pkl'))
+    condensed_cache.save_condensed_cache = functools.partial(condensed_cache.save_condensed_cache, filename=path('condensed_summaries.pkl'))
+    local_classifier.load_centroids = functools.partial(local_classifier.load_centroids, weekly_cache_file=path('weekly_cache.pkl'), centroids_file=path('category_centroids.pkl'))
+
+    # news.json, geojson_data and super_summaries are written relative to the working directory
+    os.chdir(work_directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test main.main against the fake OpenAI server.")
+    parser.add_argument('--server', default='http://127.0.0.1:8000')
+    parser.add_argument('--articles', type=int, default=100, help="Number of synthetic articles, e.g. 100 to 5000")
+    parser.add_argument('--with-bart', action='store_true', help="Also run the BART daily summary")
+    parser.add_argument('--keep', action='store_true', help="Keep the temporary directory with the run's output")
+    args = parser.parse_args()
+
+    # A fresh run id gives new URLs, so nothing is answered from a cache
+    run = uuid.uuid4().hex[:8]
+    feeds = -(-args.articles // ARTICLES_PER_FEED)
+    newsplanet.sources = [
+        (f"{args.server}/feeds/{run}/{i}.xml?articles={ARTICLES_PER_FEED}", min(ARTICLES_PER_FEED, args.articles - i * ARTICLES_PER_FEED))
+        for i in range(feeds)
+    ]
+
+    work_directory = tempfile.mkdtemp(prefix='newsplanet-load-')
+    isolate(work_directory)
+
+    # Every synthetic feed is on one host, so the per-host limit and time budget
+    # meant for real sources would throttle or silently drop articles
+    scraper.scrape_all_headlines = functools.partial(scraper.scrape_all_headlines, host_limit=scraper.max_scrape_workers, time_budget=24 * 3600)
+
+    # Nothing leaves the machine except requests to the fake server
+    ftp_uploader.upload_to_ftp = lambda *args, **kwargs: None
+    locations.get_coordinates = lambda extracted_locations: [(None, None)] * len(extracted_locations)
+    if not args.with_bart:
+        summarizer.summarize_daily_cache = lambda cache_file: [(summary[0], summary[2][:200]) for summary in cache_files.load_cache(cache_file)]
+
+    requests.post(f"{args.server}/stats/reset")
+    start = time.perf_counter()
+    news = newsplanet.main()
+    elapsed = time.perf_counter() - start
+    stats = requests.get(f"{args.server}/stats").json()
+
+    processed = len(cache_files.load_cache(newsplanet.cache_file))
+    published = sum(len(category['summaries']) for category in news['categories'])
+    print(f"\nRun {run}: {args.articles} articles requested from {feeds} feeds, {processed} summarized, {published} in news.json")
+    print(f"Elapsed: {elapsed:.1f}s ({processed / elapsed:.2f} summarized articles/s)")
+    print(json.dumps(stats, indent=4))
+
+    if args.keep:
+        print(f"Output kept in {work_directory}")
+    else:
+        shutil.rmtree(work_directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
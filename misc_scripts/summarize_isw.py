@@ -1,35 +1,29 @@
 import os
-import torch
-from transformers import BartTokenizer, BartForConditionalGeneration
-from transformers import pipeline
+import sys
 import requests
 from bs4 import BeautifulSoup
 import configparser
 from nltk.tokenize import sent_tokenize
 import re
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules import model_registry
+
 config = configparser.ConfigParser()
 
 config.read('modules/suite_config.ini')
 openai_api_key = config['OPENAI']['OPENAI_API_KEY']
 
 def summarize_text_file(file_path, model_name='facebook/bart-large-cnn', chunk_size=2000, batch_size=10, max_length=100, min_length=60):
-    # Check if GPU is available and use GPU:0 (if available)
-    device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
-    os.environ["CUDA_VISIBLE_DEVICES"] = "0"  # Replace '0' with the GPU index you want to use
-
     # Check if the text file exists
     if not os.path.exists(file_path):
         print(f"No text file found at {file_path}")
         return
 
-    # Initialize the tokenizer and model
-    tokenizer = BartTokenizer.from_pretrained(model_name)
-    model = BartForConditionalGeneration.from_pretrained(model_name).to(device)
-
-    # Initialize the summarization pipeline
+    # Get the summarization pipeline for the configured backend
     print("Initialize the summarize text file pipeline.")
-    summarizer = pipeline('summarization', model=model, tokenizer=tokenizer, device=0 if torch.cuda.is_available() else -1)
+    summarizer = model_registry.get_summarizer(model_name)
+    tokenizer = summarizer.tokenizer
 
     # Read the text file
     with open(file_path, 'r', encoding='utf-8') as file:
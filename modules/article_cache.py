@@ -0,0 +1,142 @@
+import configparser
+import hashlib
+import os
+import pickle
+import threading
+import time
+import zlib
+from modules.urls import canonical_url
+
+# Load the configuration file
+config = configparser.ConfigParser()
+config.read('modules/suite_config.ini')
+
+# Access variables
+cache_directory = config.get('Cache', 'ArticleCacheDirectory', fallback='cache/articles')
+max_cache_size_mb = config.getint('Cache', 'ArticleCacheMaxSizeMB', fallback=200)
+max_age_hours = config.getint('Cache', 'ArticleCacheMaxAgeHours', fallback=24)
+
+# Extracted article bodies are stored once per content hash as zlib blobs.
+# The index maps each canonical URL to the hash and the fetch metadata, and
+# each hash to its blob's size and last use, so eviction never scans the disk.
+_lock = threading.Lock()
+_index = None
+_index_dirty = False
+_total_size = 0
+
+def content_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def _index_file():
+    return os.path.join(cache_directory, 'index.pkl')
+
+def _blob_path(digest):
+    return os.path.join(cache_directory, f"{digest}.zlib")
+
+def _load_index():
+    global _index, _total_size
+    if _index is not None:
+        return _index
+    _index = {'urls': {}, 'blobs': {}}
+    os.makedirs(cache_directory, exist_ok=True)
+    if os.path.exists(_index_file()):
+        try:
+            with open(_index_file(), 'rb') as f:
+                loaded = pickle.load(f)
+            if 'urls' in loaded:
+                _index = loaded
+            else:
+                # Older indexes only mapped URLs, read the blob sizes from disk once
+                _index['urls'] = loaded
+                for entry in os.scandir(cache_directory):
+                    if entry.name.endswith('.zlib'):
+                        stat = entry.stat()
+                        _index['blobs'][entry.name[:-len('.zlib')]] = {'size': stat.st_size, 'last_used': stat.st_mtime}
+        except Exception as e:
+            print(f"Error while loading article cache index: {e}")
+    _total_size = sum(blob['size'] for blob in _index['blobs'].values())
+    return _index
+
+def save():
+    """Write the index if it changed since the last save. Call once at the end of a run."""
+    global _index_dirty
+    with _lock:
+        if _index is None or not _index_dirty:
+            return
+        tmp_file = _index_file() + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(_index, f)
+        os.replace(tmp_file, _index_file())
+        _index_dirty = False
+
+def _evict():
+    """Delete the least recently used blobs until the cache is back under 90% of max_cache_size_mb."""
+    global _total_size
+    max_bytes = max_cache_size_mb * 1024 * 1024
+    if _total_size <= max_bytes:
+        return
+    # Evicting below the limit means the next puts don't each trigger another pass
+    target = max_bytes * 0.9
+    blobs = _index['blobs']
+    removed = set()
+    for digest in sorted(blobs, key=lambda digest: blobs[digest]['last_used']):
+        if _total_size <= target:
+            break
+        _total_size -= blobs.pop(digest)['size']
+        removed.add(digest)
+        try:
+            os.remove(_blob_path(digest))
+        except OSError:
+            pass
+    urls = _index['urls']
+    for url in [url for url, meta in urls.items() if meta['hash'] in removed]:
+        del urls[url]
+    print(f"Evicted {len(removed)} articles from the article cache")
+
+def get(url, ignore_age=False):
+    """Return the cached article record for url, or None if it is missing or older than max_age_hours."""
+    global _index_dirty
+    with _lock:
+        index = _load_index()
+        meta = index['urls'].get(canonical_url(url))
+        if meta is None:
+            return None
+        # Articles are re-extracted after a while so live-updating pages pick up their changes
+        if not ignore_age and time.time() - meta.get('fetched_at', 0) > max_age_hours * 3600:
+            return None
+        try:
+            with open(_blob_path(meta['hash']), 'rb') as f:
+                text = zlib.decompress(f.read()).decode('utf-8')
+        except (OSError, zlib.error) as e:
+            print(f"Error while reading cached article {url}: {e}")
+            return None
+        if meta['hash'] in index['blobs']:
+            index['blobs'][meta['hash']]['last_used'] = time.time()
+            _index_dirty = True
+    return dict(meta, url=url, cleaned_text=text)
+
+def put(url, record):
+    """Store an article record under url and its resolved URL."""
+    global _total_size, _index_dirty
+    text = record['cleaned_text']
+    if not text:
+        return
+    digest = content_hash(text)
+    meta = {key: value for key, value in record.items() if key not in ('url', 'cleaned_text')}
+    meta['hash'] = digest
+    meta.setdefault('fetched_at', time.time())
+    with _lock:
+        index = _load_index()
+        if digest not in index['blobs']:
+            data = zlib.compress(text.encode('utf-8'))
+            with open(_blob_path(digest), 'wb') as f:
+                f.write(data)
+            index['blobs'][digest] = {'size': len(data), 'last_used': time.time()}
+            _total_size += len(data)
+        else:
+            index['blobs'][digest]['last_used'] = time.time()
+        index['urls'][canonical_url(url)] = meta
+        if record.get('final_url'):
+            index['urls'][canonical_url(record['final_url'])] = meta
+        _index_dirty = True
+        _evict()
@@ -17,6 +17,21 @@ def load_cache(filename):
     with open(filename, 'rb') as file:
         return pickle.load(file)
 
+def load_seen_index(filename='cache/seen_index.pkl'):
+    # The index only covers the current day, a new day starts from scratch
+    today = datetime.now().strftime('%Y-%m-%d')
+    if os.path.exists(filename):
+        try:
+            seen_index = load_cache(filename)
+            if seen_index.get('date') == today:
+                return seen_index
+        except Exception as e:
+            print(f"Error while loading seen index: {e}")
+    return {'date': today, 'entries': {}}
+
+def save_seen_index(seen_index, filename='cache/seen_index.pkl'):
+    save_cache(filename, seen_index)
+
 def save_to_weekly_cache(summaries, cache_file='cache/modular_weekly_cache.pkl'):
     # Get the current week number
     current_week_number = datetime.now().isocalendar()[1]
@@ -1,6 +1,15 @@
 import configparser
+import hashlib
+import json
+import os
+import pickle
+import re
+import threading
+import time
 import openai
 from modules.errors import robust_api_call
+from modules import local_classifier
+from modules import llm_client
 from tqdm import tqdm
 
 # Load the configuration file
@@ -11,44 +20,191 @@ config.read('modules/suite_config.ini')
 use_tqdm = config.getboolean('General', 'UseTqdm')
 model = config['Models']['CategorizeHeadlines']
 categories = config['Headlines']['Categories']
+# Lower-cased category -> its configured spelling
+category_names = {category.lower(): category for category in categories.split(', ')}
+batch_size = config.getint('Classifier', 'BatchSize', fallback=1)
+use_local_classifier = config.getboolean('Classifier', 'UseLocalModel', fallback=False)
+classification_cache_file = config.get('Cache', 'ClassificationCacheFile', fallback='cache/classification_cache.pkl')
+classification_cache_ttl_hours = config.getint('Classifier', 'CacheTTLHours', fallback=48)
+classification_cache_max_entries = config.getint('Classifier', 'CacheMaxEntries', fallback=5000)
 openai_api_key = config['OPENAI']['OPENAI_API_KEY']
 
 openai.api_key = openai_api_key
 
-def categorize_headlines(headlines):
+# Normalized headline hash -> (category, time it was classified)
+_classification_cache = None
+_classification_cache_dirty = False
+_classification_cache_lock = threading.Lock()
+
+def _headline_key(headline_text):
+    normalized = ' '.join(re.findall(r'\w+', headline_text.lower()))
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+def _load_classification_cache():
+    global _classification_cache
+    if _classification_cache is None:
+        _classification_cache = {}
+        if os.path.exists(classification_cache_file):
+            try:
+                with open(classification_cache_file, 'rb') as f:
+                    _classification_cache = pickle.load(f)
+            except Exception as e:
+                print(f"Error while loading classification cache: {e}")
+    return _classification_cache
+
+def save_classification_cache():
+    """Write the categories added since the last save, along with the local model's own labels."""
+    global _classification_cache_dirty
+    local_classifier.save_self_labelled()
+    with _classification_cache_lock:
+        if not _classification_cache_dirty:
+            return
+        # Drop expired entries, then the oldest ones beyond the size bound
+        cutoff = time.time() - classification_cache_ttl_hours * 3600
+        entries = sorted(((key, value) for key, value in _classification_cache.items() if value[1] >= cutoff), key=lambda item: item[1][1])
+        _classification_cache.clear()
+        _classification_cache.update(entries[-classification_cache_max_entries:])
+        os.makedirs(os.path.dirname(classification_cache_file) or '.', exist_ok=True)
+        with open(classification_cache_file, 'wb') as f:
+            pickle.dump(_classification_cache, f)
+        _classification_cache_dirty = False
+
+def get_cached_category(headline_text):
+    with _classification_cache_lock:
+        cached = _load_classification_cache().get(_headline_key(headline_text))
+    if cached is None or time.time() - cached[1] > classification_cache_ttl_hours * 3600:
+        return None
+    return cached[0]
+
+def categorize_headline(headline):
+    # Create the prompt as a system message to instruct the model to return only one category
+    system_message = f"Classify the following headline into a single category: {categories}. Provide only one category that best fits the headline."
+
+    # User message is the headline to classify
+    user_message = headline[0]
+
+    # Prepare the conversation with system and user messages
+    conversation = [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": user_message}
+    ]
+
+    response = robust_api_call(lambda: llm_client.chat_completion(
+        stage="classify",
+        model=model,
+        messages=conversation,
+        request_timeout = 30
+    ), retries=3, base_delay=2)
+
+
+    if response is not None:
+        # Parse the category from the response
+        category = response['choices'][0]['message']['content'].strip()
+        print(f"Model response: {category}")
+        # Ensure only one category is appended by splitting and taking the first one if multiple are provided
+        return (headline[0], category.split(',')[0].strip(), headline[1], headline[2], headline[3])
+    else:
+        print("Failed to get category for a headline after all retries. Skipping...")
+        return (headline[0], None, headline[1], headline[2], headline[3])
+
+def _parse_batch_response(content, count):
+    """Return the categories in headline order, or None if the response is malformed or names an unknown category."""
+    try:
+        parsed = json.loads(content)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(parsed, dict):
+        return None
+    batch_categories = []
+    for i in range(count):
+        category = parsed.get(str(i))
+        if not isinstance(category, str):
+            return None
+        category = category_names.get(category.split(',')[0].strip().lower())
+        if category is None:
+            return None
+        batch_categories.append(category)
+    return batch_categories
+
+def categorize_batch(headlines):
+    # A single headline uses the plain one-category prompt
+    if len(headlines) == 1:
+        return [categorize_headline(headlines[0])]
+
+    system_message = f"Classify each of the following numbered headlines into a single category: {categories}. Respond with a JSON object that maps each headline's number to the one category that best fits it."
+    user_message = "\n".join(f"{i}: {headline[0]}" for i, headline in enumerate(headlines))
+    conversation = [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": user_message}
+    ]
+
+    response = robust_api_call(lambda: llm_client.chat_completion(
+        stage="classify",
+        model=model,
+        messages=conversation,
+        response_format={"type": "json_object"},
+        request_timeout = 60
+    ), retries=3, base_delay=2)
+
+    batch_categories = None
+    if response is not None:
+        batch_categories = _parse_batch_response(response['choices'][0]['message']['content'], len(headlines))
+    if batch_categories is None:
+        # Split a malformed or failed batch and retry each half
+        print(f"Malformed response for a batch of {len(headlines)} headlines. Splitting...")
+        middle = len(headlines) // 2
+        return categorize_batch(headlines[:middle]) + categorize_batch(headlines[middle:])
+
+    print(f"Model response: {batch_categories}")
+    return [(headline[0], category, headline[1], headline[2], headline[3]) for headline, category in zip(headlines, batch_categories)]
+
+def categorize_headlines(headlines, batch_size=batch_size, model=None, save_cache=True):
+    global _classification_cache_dirty
+    # Headlines classified recently are answered from the cache without any request
+    cached_categories = [get_cached_category(headline[0]) for headline in headlines]
+    uncached = [headline for headline, category in zip(headlines, cached_categories) if category is None]
+    if len(uncached) < len(headlines):
+        print(f"Found {len(headlines) - len(uncached)} headlines in the classification cache")
+
+    uncached_results = _categorize_uncached(uncached, batch_size, model)
+    if uncached_results:
+        with _classification_cache_lock:
+            cache = _load_classification_cache()
+            for categorized_headline in uncached_results:
+                if categorized_headline[1] is not None:
+                    cache[_headline_key(categorized_headline[0])] = (categorized_headline[1], time.time())
+                    _classification_cache_dirty = True
+    # The pipeline classifies one headline at a time and saves once at the end
+    if save_cache:
+        save_classification_cache()
+
+    uncached_results = iter(uncached_results)
+    return [(headline[0], category, headline[1], headline[2], headline[3]) if category is not None else next(uncached_results)
+            for headline, category in zip(headlines, cached_categories)]
+
+def _categorize_uncached(headlines, batch_size, model):
+    # The local embedding classifier handles confident headlines, only the rest go to GPT
+    if model is not None and use_local_classifier and headlines:
+        predictions = local_classifier.predict([headline[0] for headline in headlines], model)
+        escalated = [headline for headline, category in zip(headlines, predictions) if category is None]
+        print(f"Classified {len(headlines) - len(escalated)} headlines locally, escalating {len(escalated)}")
+        escalated_results = iter(_categorize_uncached(escalated, batch_size, None))
+        return [(headline[0], category, headline[1], headline[2], headline[3]) if category is not None else next(escalated_results)
+                for headline, category in zip(headlines, predictions)]
+
     categorized_headlines = []
 
+    if batch_size > 1:
+        batches = [headlines[i:i + batch_size] for i in range(0, len(headlines), batch_size)]
+        iterator = tqdm(batches, desc="Categorizing headlines") if use_tqdm else batches
+        for batch in iterator:
+            categorized_headlines.extend(categorize_batch(batch))
+        return categorized_headlines
+
     iterator = tqdm(headlines, desc="Categorizing headlines") if use_tqdm else headlines
 
     for headline in iterator:
-        # Create the prompt as a system message to instruct the model to return only one category
-        system_message = f"Classify the following headline into a single category: {categories}. Provide only one category that best fits the headline."
-
-        # User message is the headline to classify
-        user_message = headline[0]
-
-        # Prepare the conversation with system and user messages
-        conversation = [
-            {"role": "system", "content": system_message},
-            {"role": "user", "content": user_message}
-        ]
-
-        response = robust_api_call(lambda: openai.ChatCompletion.create(
-            model=model,
-            messages=conversation,
-            request_timeout = 30
-        ), retries=3, base_delay=2)
-
-
-        if response is not None:
-            # Parse the category from the response
-            category = response['choices'][0]['message']['content'].strip()
-            print(f"Model response: {category}")
-            # Ensure only one category is appended by splitting and taking the first one if multiple are provided
-            categorized_headlines.append((headline[0], category.split(',')[0].strip(), headline[1], headline[2], headline[3]))
-        else:
-            print("Failed to get category for a headline after all retries. Skipping...")
-            categorized_headlines.append((headline[0], None, headline[1], headline[2], headline[3]))
+        categorized_headlines.append(categorize_headline(headline))
 
     return categorized_headlines
 
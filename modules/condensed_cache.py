@@ -0,0 +1,65 @@
+import configparser
+import hashlib
+import os
+import pickle
+import time
+from modules import model_registry
+
+# Load the configuration file
+config = configparser.ConfigParser()
+config.read('modules/suite_config.ini')
+
+# Access variables
+condensed_cache_file = config.get('Cache', 'CondensedCacheFile', fallback='cache/condensed_summaries.pkl')
+condensed_cache_max_age_days = config.getint('Cache', 'CondensedCacheMaxAgeDays', fallback=14)
+
+
+def _key(text, model_name, backend, max_length, min_length):
+    key = f"{model_name}\n{backend}\n{max_length}\n{min_length}\n{text}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def load_condensed_cache(filename=condensed_cache_file):
+    if os.path.exists(filename):
+        try:
+            with open(filename, 'rb') as f:
+                return pickle.load(f)
+        except Exception as e:
+            print(f"Error while loading condensed summaries: {e}")
+    return {}
+
+
+def save_condensed_cache(cache, filename=condensed_cache_file):
+    # Drop condensations older than the maximum age before writing
+    cutoff = time.time() - condensed_cache_max_age_days * 86400
+    cache = {key: value for key, value in cache.items() if value[1] >= cutoff}
+    os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+    with open(filename, 'wb') as f:
+        pickle.dump(cache, f)
+
+
+def condense_summaries(texts, max_length, min_length, model_name=model_registry.DEFAULT_SUMMARIZATION_MODEL, backend=model_registry.bart_backend):
+    """
+    Condense each article summary with BART, reusing earlier results.
+
+    Results are memoized on disk by summary text, model, backend and length
+    parameters, so only summaries never condensed with these settings are
+    run through the model. Condensations come back in input order.
+    """
+    cache = load_condensed_cache()
+    keys = [_key(text, model_name, backend, max_length, min_length) for text in texts]
+    # Identical texts share a key, each is condensed only once
+    missing = {}
+    for text, key in zip(texts, keys):
+        if key not in cache:
+            missing.setdefault(key, text)
+    print(f"Condensing {len(missing)} of {len(texts)} summaries, the rest are cached")
+
+    if missing:
+        condensed = model_registry.summarize_batched(list(missing.values()), model_name=model_name, backend=backend,
+                                                     max_length=max_length, min_length=min_length, do_sample=False)
+        for key, summary in zip(missing, condensed):
+            cache[key] = (summary, time.time())
+        save_condensed_cache(cache)
+
+    return [cache[key][0] for key in keys]
@@ -0,0 +1,70 @@
+import re
+import threading
+import requests
+from urllib.parse import urlsplit
+from modules import scraper
+from modules.urls import canonical_url, strip_tracking
+
+# Feeds whose links are redirects to the publisher's article
+REDIRECT_HOSTS = ('news.google.com',)
+
+# Titles shorter than this are too generic ("Live updates") to dedup on
+MIN_TITLE_WORDS = 5
+
+_resolved = {}
+_resolved_lock = threading.Lock()
+
+def resolve_url(url):
+    """Follow the redirect for aggregator links, other URLs are returned unchanged."""
+    # Replayed headlines already carry the resolved URL, and a replay makes no requests
+    if scraper.replay or urlsplit(url).hostname not in REDIRECT_HOSTS:
+        return url
+    with _resolved_lock:
+        if url in _resolved:
+            return _resolved[url]
+    try:
+        response = requests.get(url, allow_redirects=True, timeout=10)
+        response.raise_for_status()
+        resolved = response.url
+    except requests.RequestException as e:
+        print(f"Error resolving redirect for {url}: {e}")
+        resolved = url
+    with _resolved_lock:
+        _resolved[url] = resolved
+    return resolved
+
+def _title_key(title):
+    words = re.findall(r'\w+', title.lower())
+    return ' '.join(words) if len(words) >= MIN_TITLE_WORDS else None
+
+def dedup_headlines(headlines, index=None):
+    """
+    Collapse headlines that point at the same article.
+
+    Links are resolved and stripped of tracking parameters, then indexed by
+    canonical URL and normalized title. The first occurrence is kept. Pass the
+    same index to several calls to dedup across batches.
+    """
+    if index is None:
+        index = {}
+    unique_headlines = []
+    for title, url, timestamp, source in headlines:
+        link = strip_tracking(resolve_url(url))
+        keys = [canonical_url(link), _title_key(title)]
+        duplicate_of = next((index[key] for key in keys if key in index), None)
+        if duplicate_of is not None:
+            print(f"Dropping duplicate from {source}: {title} (already have {duplicate_of})")
+            continue
+        for key in keys:
+            if key is not None:
+                index[key] = url
+
+        # Keep the article extracted while scraping reachable under the new link
+        if link != url:
+            record = scraper.get_stored_article(url)
+            if record is not None:
+                scraper.store_article(link, dict(record, final_url=link))
+        unique_headlines.append((title, link, timestamp, source))
+
+    print(f"Kept {len(unique_headlines)} of {len(headlines)} headlines after dedup")
+    return unique_headlines
@@ -1,25 +1,156 @@
+import configparser
+import random
+import threading
 import time
+from email.utils import parsedate_to_datetime
 import openai
+from .llm_client import ReplayMissError
+
+# Load the configuration file
+config = configparser.ConfigParser()
+config.read('modules/suite_config.ini')
+
+# Access variables
+max_delay_seconds = config.getfloat('Retry', 'MaxDelaySeconds', fallback=30)
+jitter = config.getfloat('Retry', 'Jitter', fallback=0.5)
+breaker_threshold = config.getint('Retry', 'BreakerThreshold', fallback=5)
+breaker_cooldown_seconds = config.getfloat('Retry', 'BreakerCooldownSeconds', fallback=60)
+
+# Errors that will fail the same way however often they are retried
+NON_RETRYABLE = (
+    openai.error.InvalidRequestError,
+    openai.error.AuthenticationError,
+    openai.error.PermissionError,
+    ReplayMissError,
+)
+# Errors that suggest the endpoint itself is down; these count towards opening the breaker
+OUTAGE_ERRORS = (
+    openai.error.APIConnectionError,
+    openai.error.ServiceUnavailableError,
+    openai.error.Timeout,
+    openai.error.APIError,
+)
+
+
+class CircuitBreaker:
+    """
+    Consecutive outage failures shared by every caller of robust_api_call.
+
+    After `threshold` outage errors in a row the breaker opens and calls fail
+    immediately for `cooldown` seconds. Then a single trial call is let
+    through: success closes the breaker, failure opens it for another cooldown.
+    """
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if self.trial_in_flight or time.monotonic() - self.opened_at < self.cooldown:
+                return False
+            self.trial_in_flight = True
+            return True
+
+    def is_open(self):
+        with self.lock:
+            return self.opened_at is not None
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial_in_flight or self.failures >= self.threshold:
+                if self.opened_at is None or self.trial_in_flight:
+                    print(f"Circuit breaker open after {self.failures} consecutive failures, failing fast for {self.cooldown} seconds.")
+                self.opened_at = time.monotonic()
+                self.trial_in_flight = False
+
+    def release_trial(self):
+        # A trial call that failed for a non-outage reason says nothing about the endpoint
+        with self.lock:
+            self.trial_in_flight = False
+
+
+breaker = CircuitBreaker(breaker_threshold, breaker_cooldown_seconds)
+
+
+def retry_after_seconds(error):
+    """Return the server's Retry-After hint for an openai error in seconds, or None."""
+    headers = getattr(error, 'headers', None) or {}
+    value = headers.get('retry-after-ms')
+    if value is not None:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get('retry-after')
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, base_delay):
+    """Exponential backoff capped at MaxDelaySeconds, with the top `jitter` share randomized."""
+    delay = min(max_delay_seconds, base_delay * 2 ** attempt)
+    return delay * (1 - jitter) + random.uniform(0, delay * jitter)
+
 
 def robust_api_call(call, retries=3, base_delay=2):
-    delay = base_delay
     for attempt in range(retries):
+        if not breaker.allow():
+            print("Circuit breaker open, skipping API call.")
+            return None
         try:
             print(f"Attempting API call, attempt {attempt + 1}")
-            return call()
-        except openai.error.APIError as e:
-            print(f"API Error: {e}. Attempt {attempt + 1} of {retries}")
-        except openai.error.APIConnectionError as e:
-            print(f"Connection Error: {e}. Attempt {attempt + 1} of {retries}")
+            response = call()
+            breaker.record_success()
+            return response
+        except NON_RETRYABLE as e:
+            breaker.release_trial()
+            print(f"Request failed and will not be retried: {e}")
+            return None
         except openai.error.RateLimitError as e:
-            print(f"Rate Limit Exceeded: {e}. Waiting {delay} seconds.")
-        except openai.error.ServiceUnavailableError as e:
-            print(f"Service Unavailable: {e}. Waiting {delay} seconds.")
-        except openai.error.Timeout as e:
-            print(f"Timeout: {e}. Waiting {delay} seconds.")
+            # The endpoint is up, it just wants us to slow down
+            breaker.release_trial()
+            error = e
+            print(f"Rate Limit Exceeded: {e}. Attempt {attempt + 1} of {retries}")
+        except OUTAGE_ERRORS as e:
+            breaker.record_failure()
+            error = e
+            print(f"{type(e).__name__}: {e}. Attempt {attempt + 1} of {retries}")
         except Exception as e:
+            breaker.release_trial()
+            error = e
             print(f"An unexpected error occurred: {e}. Attempt {attempt + 1} of {retries}")
+        if attempt == retries - 1 or breaker.is_open():
+            break
+        delay = backoff_delay(attempt, base_delay)
+        hint = retry_after_seconds(error)
+        if hint is not None:
+            if hint > max_delay_seconds:
+                print(f"Server asked to retry after {hint:.0f} seconds, more than the {max_delay_seconds:.0f} second limit. Giving up.")
+                return None
+            delay = hint + random.uniform(0, hint * jitter)
+        print(f"Waiting {delay:.1f} seconds.")
         time.sleep(delay)
-        delay *= 2  # Exponential backoff for any retry scenario
     print("All API call attempts failed.")
     return None
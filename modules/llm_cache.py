@@ -0,0 +1,87 @@
+import configparser
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Load the configuration file
+config = configparser.ConfigParser()
+config.read('modules/suite_config.ini')
+
+# Access variables
+# off: no caching, record: serve hits and store new responses, replay: serve from the cache only
+cache_mode = config.get('LLM', 'CacheMode', fallback='off').lower()
+cache_file = config.get('LLM', 'CacheFile', fallback='cache/llm_cache.sqlite')
+cache_ttl_hours = config.getint('LLM', 'CacheTTLHours', fallback=168)
+cache_max_size_mb = config.getint('LLM', 'CacheMaxSizeMB', fallback=500)
+
+CACHE_MODES = ('off', 'record', 'replay')
+if cache_mode not in CACHE_MODES:
+    print(f"Unknown LLM cache mode {cache_mode}, expected one of {CACHE_MODES}. Caching is off.")
+    cache_mode = 'off'
+
+# Arguments that don't change the completion
+IGNORED_ARGUMENTS = ('request_timeout',)
+
+_connection = None
+_lock = threading.Lock()
+
+
+def _connect():
+    global _connection
+    if _connection is None:
+        os.makedirs(os.path.dirname(cache_file) or '.', exist_ok=True)
+        _connection = sqlite3.connect(cache_file, check_same_thread=False)
+        _connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        _connection.commit()
+    return _connection
+
+
+def request_key(kwargs):
+    """Hash the model, messages and parameters of a chat completion request."""
+    request = {key: value for key, value in kwargs.items() if key not in IGNORED_ARGUMENTS}
+    return hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def get(key):
+    """Return the stored response for key as a dict, or None. Replay mode ignores the TTL."""
+    with _lock:
+        connection = _connect()
+        row = connection.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if cache_mode != 'replay' and time.time() - row[1] > cache_ttl_hours * 3600:
+            return None
+        connection.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+        connection.commit()
+    return json.loads(row[0])
+
+
+def put(key, response):
+    data = json.dumps(response)
+    now = time.time()
+    with _lock:
+        connection = _connect()
+        connection.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)", (key, data, len(data), now, now))
+        _evict(connection, now)
+        connection.commit()
+
+
+def _evict(connection, now):
+    # Expired responses go first, then the least recently used until the cache fits
+    connection.execute("DELETE FROM responses WHERE created < ?", (now - cache_ttl_hours * 3600,))
+    max_bytes = cache_max_size_mb * 1024 * 1024
+    total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    if total <= max_bytes:
+        return
+    for key, size in connection.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall():
+        connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+        total -= size
+        if total <= max_bytes:
+            break
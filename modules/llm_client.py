@@ -0,0 +1,159 @@
+import asyncio
+import configparser
+import threading
+from collections import deque
+import openai
+from openai.util import convert_to_openai_object
+from modules import llm_cache
+from modules.rate_limiter import openai_limiter, estimate_tokens
+
+# Load the configuration file
+config = configparser.ConfigParser()
+config.read('modules/suite_config.ini')
+
+# Access variables
+default_model_concurrency = config.getint('LLM', 'MaxConcurrency', fallback=8)
+# Comma separated "model: limit" pairs, e.g. "gpt-4-1106-preview: 2, gpt-3.5-turbo-1106: 16"
+model_concurrency = {
+    model.strip(): int(limit)
+    for model, limit in (pair.split(':') for pair in config.get('LLM', 'ModelConcurrency', fallback='').split(',') if ':' in pair)
+}
+
+# Send requests somewhere other than api.openai.com, e.g. misc_scripts/fake_openai_server.py
+api_base = config.get('OPENAI', 'ApiBase', fallback=None)
+if api_base:
+    openai.api_base = api_base
+
+# Completion budget assumed for calls that don't set max_tokens
+DEFAULT_COMPLETION_TOKENS = 256
+
+
+class ReplayMissError(Exception):
+    """Raised in replay mode when a request has no recorded response."""
+
+
+class _Scheduler:
+    """
+    Dispatches chat completions from every module on one asyncio loop.
+
+    Each stage (classify, summarize, locations, ...) has its own queue and the
+    queues are served round-robin, so a stage with a long backlog can't starve
+    the others. A request is only dispatched when its model is below its
+    concurrency cap and the shared rate limiter has room for it.
+    """
+
+    def __init__(self):
+        self.queues = {}
+        self.stages = deque()
+        self.in_flight = {}
+        self.wakeup = asyncio.Event()
+
+    def submit(self, stage, kwargs, future):
+        if stage not in self.queues:
+            self.queues[stage] = deque()
+            self.stages.append(stage)
+        self.queues[stage].append((kwargs, future))
+        self.wakeup.set()
+
+    def _limit(self, model):
+        return model_concurrency.get(model, default_model_concurrency)
+
+    def _next(self):
+        # Rotate through the stages, taking the first head request whose model has capacity
+        for _ in range(len(self.stages)):
+            stage = self.stages[0]
+            self.stages.rotate(-1)
+            queue = self.queues[stage]
+            if queue:
+                model = queue[0][0].get('model')
+                if self.in_flight.get(model, 0) < self._limit(model):
+                    return queue.popleft()
+        return None
+
+    async def run(self):
+        while True:
+            item = self._next()
+            if item is None:
+                await self.wakeup.wait()
+                self.wakeup.clear()
+                continue
+            kwargs, future = item
+            model = kwargs.get('model')
+            self.in_flight[model] = self.in_flight.get(model, 0) + 1
+            await openai_limiter.acquire_async(_estimate_request_tokens(kwargs))
+            asyncio.ensure_future(self._execute(kwargs, future))
+
+    async def _execute(self, kwargs, future):
+        try:
+            response = await openai.ChatCompletion.acreate(**kwargs)
+            future.set_result(response)
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            model = kwargs.get('model')
+            self.in_flight[model] -= 1
+            self.wakeup.set()
+
+
+def _estimate_request_tokens(kwargs):
+    prompt = ' '.join(str(message.get('content', '')) for message in kwargs.get('messages', []))
+    return estimate_tokens(prompt, kwargs.get('max_tokens', DEFAULT_COMPLETION_TOKENS))
+
+
+_loop = None
+_scheduler = None
+_start_lock = threading.Lock()
+
+
+def _ensure_started():
+    global _loop
+    with _start_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run_loop():
+                global _scheduler
+                asyncio.set_event_loop(loop)
+                _scheduler = _Scheduler()
+                loop.create_task(_scheduler.run())
+                ready.set()
+                loop.run_forever()
+
+            threading.Thread(target=run_loop, name="llm-client", daemon=True).start()
+            ready.wait()
+            _loop = loop
+    return _loop
+
+
+def chat_completion(stage='default', **kwargs):
+    """
+    Create a chat completion through the shared client and wait for the response.
+
+    Takes the same arguments as openai.ChatCompletion.create plus the name of
+    the calling stage, and raises the same errors, so callers keep wrapping it
+    in robust_api_call. With [LLM] CacheMode set to record, responses are
+    served from and saved to the response cache; with replay, they are only
+    served from it and nothing goes over the network.
+    """
+    key = None
+    if llm_cache.cache_mode in ('record', 'replay'):
+        key = llm_cache.request_key(kwargs)
+        cached = llm_cache.get(key)
+        if cached is not None:
+            return convert_to_openai_object(cached)
+        if llm_cache.cache_mode == 'replay':
+            raise ReplayMissError(f"No recorded response for {stage} request to {kwargs.get('model')}")
+
+    loop = _ensure_started()
+
+    async def enqueue():
+        result = loop.create_future()
+        _scheduler.submit(stage, kwargs, result)
+        return await result
+
+    future = asyncio.run_coroutine_threadsafe(enqueue(), loop)
+    response = future.result()
+    if key is not None:
+        llm_cache.put(key, response)
+    return response
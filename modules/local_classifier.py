@@ -0,0 +1,159 @@
+import configparser
+import os
+import pickle
+import threading
+import time
+from datetime import date, timedelta
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+# Config parser
+config = configparser.ConfigParser()
+config.read('modules/suite_config.ini')
+
+# Model config
+MODEL_NAME = config.get('Models', 'SimilarityModel')
+CATEGORIES = config['Headlines']['Categories'].split(', ')
+WEEKLY_CACHE_FILE = config['Cache']['WeeklyCacheFile']
+CENTROIDS_FILE = config.get('Cache', 'CentroidsFile', fallback='cache/category_centroids.pkl')
+SELF_LABELLED_FILE = config.get('Cache', 'LocalLabelsFile', fallback='cache/local_labels.pkl')
+
+# Thresholds
+MIN_SIMILARITY = config.getfloat('Classifier', 'LocalMinSimilarity', fallback=0.45)
+MIN_MARGIN = config.getfloat('Classifier', 'LocalMinMargin', fallback=0.05)
+MIN_EXAMPLES = config.getint('Classifier', 'LocalMinExamples', fallback=5)
+# Centroids are built from this many most recent weeks of the weekly cache
+TRAINING_WEEKS = config.getint('Classifier', 'LocalTrainingWeeks', fallback=4)
+
+# Centroids are loaded once per process
+_centroids: Dict[str, Tuple[List[str], np.ndarray]] = {}
+_centroids_lock = threading.Lock()
+
+# Headlines this model labelled itself -> time they were labelled
+_self_labelled: Optional[Dict[str, float]] = None
+_self_labelled_dirty = False
+_self_labelled_lock = threading.Lock()
+
+
+def recent_weeks(weeks: int = TRAINING_WEEKS) -> List[int]:
+    """Return the ISO week numbers of the last `weeks` weeks, the weekly cache's keys."""
+    today = date.today()
+    return [(today - timedelta(weeks=i)).isocalendar()[1] for i in range(weeks)]
+
+
+def load_self_labelled() -> Dict[str, float]:
+    global _self_labelled
+    if _self_labelled is None:
+        _self_labelled = {}
+        if os.path.exists(SELF_LABELLED_FILE):
+            with open(SELF_LABELLED_FILE, 'rb') as f:
+                _self_labelled = pickle.load(f)
+        # Labels older than the training window can no longer be trained on
+        cutoff = time.time() - TRAINING_WEEKS * 7 * 24 * 3600
+        _self_labelled = {headline: labelled for headline, labelled in _self_labelled.items() if labelled >= cutoff}
+    return _self_labelled
+
+
+def record_self_labelled(headlines: List[str]) -> None:
+    """Remember headlines the local model labelled so they are left out of its training data."""
+    global _self_labelled_dirty
+    if not headlines:
+        return
+    with _self_labelled_lock:
+        now = time.time()
+        load_self_labelled().update((headline, now) for headline in headlines)
+        _self_labelled_dirty = True
+
+
+def save_self_labelled() -> None:
+    global _self_labelled_dirty
+    with _self_labelled_lock:
+        if not _self_labelled_dirty:
+            return
+        os.makedirs(os.path.dirname(SELF_LABELLED_FILE) or '.', exist_ok=True)
+        with open(SELF_LABELLED_FILE, 'wb') as f:
+            pickle.dump(_self_labelled, f)
+        _self_labelled_dirty = False
+
+
+def load_labelled_headlines(weekly_cache_file: str = WEEKLY_CACHE_FILE, weeks: Optional[List[int]] = None) -> List[Tuple[str, str]]:
+    """Return (headline, category) pairs from the given weeks of the weekly cache, skipping the model's own labels."""
+    if not os.path.exists(weekly_cache_file):
+        return []
+    with open(weekly_cache_file, 'rb') as f:
+        weekly_cache = pickle.load(f)
+    with _self_labelled_lock:
+        self_labelled = set(load_self_labelled())
+    labelled = []
+    for week, days in weekly_cache.items():
+        if weeks is not None and week not in weeks:
+            continue
+        for summaries in days.values():
+            for summary in summaries:
+                if summary[1] in CATEGORIES and summary[0] not in self_labelled:
+                    labelled.append((summary[0], summary[1]))
+    print(f"Loaded {len(labelled)} labelled headlines")
+    return labelled
+
+
+def encode(headlines: List[str], model) -> np.ndarray:
+    embeddings = model.encode(headlines, convert_to_tensor=True).cpu().numpy()
+    return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+
+def build_centroids(labelled: List[Tuple[str, str]], model) -> Tuple[List[str], np.ndarray]:
+    by_category: Dict[str, List[str]] = {}
+    for headline, category in labelled:
+        by_category.setdefault(category, []).append(headline)
+    labels = [category for category in CATEGORIES if len(by_category.get(category, [])) >= MIN_EXAMPLES]
+    if not labels:
+        return [], np.empty((0, 0))
+    centroids = np.stack([encode(by_category[category], model).mean(axis=0) for category in labels])
+    centroids /= np.linalg.norm(centroids, axis=1, keepdims=True)
+    print(f"Built centroids for {len(labels)} categories")
+    return labels, centroids
+
+
+def load_centroids(model, weekly_cache_file: str = WEEKLY_CACHE_FILE, centroids_file: str = CENTROIDS_FILE) -> Tuple[List[str], np.ndarray]:
+    """
+    Return the category centroids, rebuilding them at most once a day.
+
+    The weekly cache is rewritten on every run, so the centroids are keyed on
+    the date and built from the last TRAINING_WEEKS weeks only.
+    """
+    built = date.today().isoformat()
+    if os.path.exists(centroids_file):
+        with open(centroids_file, 'rb') as f:
+            cached = pickle.load(f)
+        if cached.get('model') == MODEL_NAME and cached.get('built') == built and cached.get('weeks') == TRAINING_WEEKS:
+            return cached['labels'], cached['centroids']
+    labels, centroids = build_centroids(load_labelled_headlines(weekly_cache_file, recent_weeks()), model)
+    os.makedirs(os.path.dirname(centroids_file) or '.', exist_ok=True)
+    with open(centroids_file, 'wb') as f:
+        pickle.dump({'model': MODEL_NAME, 'built': built, 'weeks': TRAINING_WEEKS, 'labels': labels, 'centroids': centroids}, f)
+    return labels, centroids
+
+
+def predict(headlines: List[str], model) -> List[Optional[str]]:
+    """
+    Assign each headline to its nearest category centroid.
+
+    Headlines that are not close enough to any centroid, or about as close to
+    two of them, get None so the caller can escalate them.
+    """
+    with _centroids_lock:
+        if MODEL_NAME not in _centroids:
+            _centroids[MODEL_NAME] = load_centroids(model)
+    labels, centroids = _centroids[MODEL_NAME]
+    if len(labels) < 2 or not headlines:
+        return [None] * len(headlines)
+    similarities = encode(headlines, model) @ centroids.T
+    ranked = np.sort(similarities, axis=1)
+    predictions = []
+    for row, (best, runner_up) in zip(similarities, zip(ranked[:, -1], ranked[:, -2])):
+        if best >= MIN_SIMILARITY and best - runner_up >= MIN_MARGIN:
+            predictions.append(labels[int(np.argmax(row))])
+        else:
+            predictions.append(None)
+    record_self_labelled([headline for headline, category in zip(headlines, predictions) if category is not None])
+    return predictions
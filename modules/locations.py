@@ -1,14 +1,16 @@
+import hashlib
 import os
 import pickle
 from datetime import datetime
-import openai
 import time
 import json
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
 from geopy.geocoders import Nominatim
 from geopy.exc import GeocoderTimedOut
 from geopy.exc import GeocoderServiceError
-import time
+from modules.errors import robust_api_call
+from modules import llm_client
 
 
 # Import the configuration loader
@@ -19,85 +21,144 @@ config.read('modules/suite_config.ini')
 
 CACHE_FILE = config['Cache']['LocCacheFile']
 
+location_model = config.get('Models', 'ExtractLocations', fallback='gpt-3.5-turbo-1106')
+location_batch_size = config.getint('Locations', 'BatchSize', fallback=10)
+location_workers = config.getint('Locations', 'Workers', fallback=4)
+location_cache_ttl_hours = config.getint('Locations', 'CacheTTLHours', fallback=48)
+
 # OpenAI API key
 openai_api_key = config['OPENAI']['OPENAI_API_KEY']
 
-def extract_locations(summaries):
-    print("inside extract_locations")
-        # Attempt to load cache
-    if os.path.exists(CACHE_FILE):
-        with open(CACHE_FILE, 'rb') as f:
-            cache_time, locations = pickle.load(f)
-        
-        # If the cache is less than an hour old - return the cached data
-        if (datetime.now() - cache_time).total_seconds() < 21600: # 6 hours
-            return locations
-    locations = []
-    for summary in tqdm(summaries, desc="Extracting locations"):
-        title, category, text, link, timestamp, source = summary
-        print(text)
-        for _ in range(3):  # Try the API call up to 3 times
-            try:
-                response = openai.ChatCompletion.create(
-                    model="gpt-3.5-turbo-1106",
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "You are a deterministic AI specializing in Named Entity Recognition, employed by a NewsPlanetAI, a reputable news source. You have been given the task of reading news articles and identifying one location that the news article is most likely about. Your response will be used to geocode the locations of the articles on a map. Give one location ONLY in English, in this format \"City, Country\". If the article does not provide a location, respond \"None\"."
-                        },
-                        {
-                            "role": "user",
-                            "content": f"Please give one location for this article per the instructions,  \"{text}\""
-                        },
-                    ],
-                    temperature=0,
-                    max_tokens=80,
-                    top_p=1,
-                    frequency_penalty=0,
-                    presence_penalty=0,
-                    request_timeout=15  # Set the request timeout to 15 seconds
-                )
-                # If the API call succeeds, exit the loop
-                
-                location = response['choices'][0]['message']['content'].strip()  # remove leading/trailing spaces
-                print(location)
-                if location.lower() == "none":  # Log if None location
-                    print(f"Headline: {title} - Location: {location} (none)")
-    
-                locations.append(location)
-
-                break
-            except openai.error.APIError as e:
-                print(f"OpenAI API returned an API Error: {e}. Retrying...")
-                time.sleep(1)  # Wait for 2 seconds before retrying
-            except openai.error.APIConnectionError as e:
-                print(f"Failed to connect to OpenAI API: {e}. Retrying...")
-                time.sleep(1)
-            except openai.error.RateLimitError as e:
-                print(f"OpenAI API request exceeded rate limit: {e}. Retrying after a longer delay...")
-                time.sleep(2)  # Wait longer if rate limit has been exceeded
-            except openai.error.ServiceUnavailableError as e:
-                print(f"OpenAI API service unavailable: {e}. Retrying...")
-                time.sleep(2)  # Wait for 10 seconds before retrying
-            except openai.error.Timeout as e:
-                print(f"Request timed out: {e}. Retrying...")
-                time.sleep(3)  # You may want to implement exponential backoff here                
-        else:
-            # If the API call failed 3 times, add a None location and continue with the next summary
-            print("Failed to get location for a summary after 3 attempts. Skipping...")
-            locations.append(None)
-            continue
-
-    # Check if the lengths of summaries and extracted_locations are different
-    if len(summaries) != len(locations):
-        # If they are different, append "None" to extracted_locations to match the lengths
-        locations += [None] * (len(summaries) - len(locations))
-
-    # Cache data and return locations
-    cache_data = (datetime.now(), locations)
+LOCATION_INSTRUCTIONS = "You are a deterministic AI specializing in Named Entity Recognition, employed by a NewsPlanetAI, a reputable news source. You have been given the task of reading news articles and identifying one location that the news article is most likely about. Your response will be used to geocode the locations of the articles on a map. Give one location ONLY in English, in this format \"City, Country\". If the article does not provide a location, respond \"None\"."
+
+def extract_location(summary):
+    title, category, text, link, timestamp, source = summary
+    response = robust_api_call(lambda: llm_client.chat_completion(
+        stage="locations",
+        model=location_model,
+        messages=[
+            {
+                "role": "system",
+                "content": LOCATION_INSTRUCTIONS
+            },
+            {
+                "role": "user",
+                "content": f"Please give one location for this article per the instructions,  \"{text}\""
+            },
+        ],
+        temperature=0,
+        max_tokens=80,
+        top_p=1,
+        frequency_penalty=0,
+        presence_penalty=0,
+        request_timeout=15  # Set the request timeout to 15 seconds
+    ), retries=3, base_delay=1)
+
+    if response is None:
+        print(f"Failed to get location for {title} after all retries. Skipping...")
+        return None
+
+    location = response['choices'][0]['message']['content'].strip()  # remove leading/trailing spaces
+    if location.lower() == "none":  # Log if None location
+        print(f"Headline: {title} - Location: {location} (none)")
+    return location
+
+def _parse_batch_response(content, count):
+    """Return the locations in summary order, or None if the response is malformed."""
+    try:
+        parsed = json.loads(content)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(parsed, dict):
+        return None
+    batch_locations = []
+    for i in range(count):
+        # A missing number is malformed, only an explicit null or "None" means no location
+        if str(i) not in parsed:
+            return None
+        location = parsed[str(i)]
+        if location is None:
+            location = "None"
+        if not isinstance(location, str) or not location.strip():
+            return None
+        location = location.strip()
+        batch_locations.append("None" if location.lower() == "none" else location)
+    return batch_locations
+
+def extract_locations_batch(summaries):
+    # A single summary uses the plain one-location prompt
+    if len(summaries) == 1:
+        return [extract_location(summaries[0])]
+
+    system_message = LOCATION_INSTRUCTIONS + " You will be given several numbered articles. Respond with a JSON object that maps each article's number to its location."
+    user_message = "\n".join(f"{i}: {summary[2]}" for i, summary in enumerate(summaries))
+
+    response = robust_api_call(lambda: llm_client.chat_completion(
+        stage="locations",
+        model=location_model,
+        messages=[
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": user_message},
+        ],
+        temperature=0,
+        max_tokens=20 * len(summaries),
+        response_format={"type": "json_object"},
+        request_timeout=30
+    ), retries=3, base_delay=1)
+
+    batch_locations = None
+    if response is not None:
+        batch_locations = _parse_batch_response(response['choices'][0]['message']['content'], len(summaries))
+    if batch_locations is None:
+        # Split a malformed or failed batch and retry each half
+        print(f"Malformed response for a batch of {len(summaries)} summaries. Splitting...")
+        middle = len(summaries) // 2
+        return extract_locations_batch(summaries[:middle]) + extract_locations_batch(summaries[middle:])
+    return batch_locations
+
+def _location_key(summary):
+    return hashlib.sha1(summary[2].encode('utf-8')).hexdigest()
+
+def load_location_cache():
+    """Return the summary hash -> (location, time it was extracted) cache, without expired entries."""
+    if not os.path.exists(CACHE_FILE):
+        return {}
+    with open(CACHE_FILE, 'rb') as f:
+        cache = pickle.load(f)
+    # Older versions stored a single (cache_time, locations) snapshot
+    if not isinstance(cache, dict):
+        return {}
+    cutoff = time.time() - location_cache_ttl_hours * 3600
+    return {key: entry for key, entry in cache.items() if entry[1] >= cutoff}
+
+def save_location_cache(cache):
+    os.makedirs(os.path.dirname(CACHE_FILE) or '.', exist_ok=True)
     with open(CACHE_FILE, 'wb') as f:
-        pickle.dump(cache_data, f)
-    return locations
+        pickle.dump(cache, f)
+
+def extract_locations(summaries, use_cache=True, batch_size=location_batch_size, max_workers=location_workers):
+    print("inside extract_locations")
+    # Summaries whose text was seen before reuse its location, only the rest are sent
+    cache = load_location_cache() if use_cache else {}
+    keys = [_location_key(summary) for summary in summaries]
+    uncached = [summary for summary, key in zip(summaries, keys) if key not in cache]
+    print(f"Found {len(summaries) - len(uncached)} locations in the cache, extracting {len(uncached)}")
+
+    # Batches are numbered so every location stays with its summary, and run
+    # concurrently through the shared LLM client and its rate limiter
+    batches = [uncached[i:i + max(batch_size, 1)] for i in range(0, len(uncached), max(batch_size, 1))]
+    with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+        results = list(tqdm(executor.map(extract_locations_batch, batches), total=len(batches), desc="Extracting locations"))
+    new_locations = {}
+    for summary, location in zip(uncached, (location for batch_locations in results for location in batch_locations)):
+        new_locations[_location_key(summary)] = location
+
+    if use_cache and new_locations:
+        # Failed extractions are left out so the next run tries them again
+        now = time.time()
+        cache.update({key: (location, now) for key, location in new_locations.items() if location is not None})
+        save_location_cache(cache)
+    return [new_locations[key] if key in new_locations else cache[key][0] for key in keys]
 
 
 def get_coordinates(locations):
@@ -0,0 +1,155 @@
+import configparser
+import gc
+import os
+import threading
+import torch
+from tqdm import tqdm
+from transformers import BartForConditionalGeneration, BartTokenizer, pipeline
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Load the configuration file
+config = configparser.ConfigParser()
+config.read('modules/suite_config.ini')
+
+# Access variables
+min_available_memory_mb = config.getint('Models', 'MinAvailableMemoryMB', fallback=1024)
+max_batch_tokens = config.getint('Models', 'BartMaxBatchTokens', fallback=4096)
+bart_backend = config.get('Models', 'BartBackend', fallback='pytorch')
+onnx_export_directory = config.get('Models', 'OnnxExportDirectory', fallback='cache/onnx')
+
+DEFAULT_SUMMARIZATION_MODEL = 'facebook/bart-large-cnn'
+# pytorch: fp32 weights, quantized: dynamic int8 Linear layers on CPU, onnx: ONNX Runtime via optimum
+BACKENDS = ('pytorch', 'quantized', 'onnx')
+
+# Summarization pipelines loaded by this process, keyed by (model name, backend)
+_pipelines = {}
+_lock = threading.Lock()
+
+
+def _device():
+    os.environ.setdefault("CUDA_VISIBLE_DEVICES", "0")  # Replace '0' with the GPU index you want to use
+    # Check if GPU is available and use GPU:0 (if available)
+    return torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
+
+
+def _load_pipeline(model_name, backend):
+    tokenizer = BartTokenizer.from_pretrained(model_name)
+    if backend == 'onnx':
+        try:
+            from optimum.onnxruntime import ORTModelForSeq2SeqLM
+        except ImportError:
+            print("optimum[onnxruntime] is not installed, falling back to the pytorch backend")
+            return _load_pipeline(model_name, 'pytorch')
+        # Exporting takes minutes, so it is done once and the ONNX files are reused
+        export_path = os.path.join(onnx_export_directory, model_name.replace('/', '--'))
+        if os.path.exists(os.path.join(export_path, 'config.json')):
+            model = ORTModelForSeq2SeqLM.from_pretrained(export_path)
+        else:
+            print(f"Exporting {model_name} to ONNX in {export_path}")
+            model = ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True)
+            model.save_pretrained(export_path)
+        return pipeline('summarization', model=model, tokenizer=tokenizer)
+    if backend == 'quantized':
+        # Dynamic quantization only runs on CPU
+        model = BartForConditionalGeneration.from_pretrained(model_name)
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return pipeline('summarization', model=model, tokenizer=tokenizer, device=-1)
+    model = BartForConditionalGeneration.from_pretrained(model_name).to(_device())
+    return pipeline('summarization', model=model, tokenizer=tokenizer, device=0 if torch.cuda.is_available() else -1)
+
+
+def get_summarizer(model_name=DEFAULT_SUMMARIZATION_MODEL, backend=bart_backend):
+    """Return the summarization pipeline for model_name, loading it the first time it is asked for."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown BART backend {backend}, expected one of {BACKENDS}")
+    with _lock:
+        if (model_name, backend) not in _pipelines:
+            _release_under_pressure()
+            print(f"Loading summarization model {model_name} ({backend})")
+            _pipelines[(model_name, backend)] = _load_pipeline(model_name, backend)
+        return _pipelines[(model_name, backend)]
+
+
+def release(model_name=None):
+    """Drop one loaded model, or all of them, and return their memory."""
+    with _lock:
+        _release(model_name)
+
+
+def _release(model_name=None):
+    keys = [key for key in _pipelines if model_name is None or key[0] == model_name]
+    for key in keys:
+        del _pipelines[key]
+        print(f"Released summarization model {key[0]} ({key[1]})")
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+def available_memory_mb():
+    """Return the available system memory in MB, or None if it can't be read."""
+    if psutil is not None:
+        return psutil.virtual_memory().available / (1024 * 1024)
+    # Without psutil, Linux still reports it in /proc/meminfo
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _release_under_pressure():
+    if not _pipelines:
+        return
+    available_mb = available_memory_mb()
+    # Without a reliable reading the models are kept
+    if available_mb is not None and available_mb < min_available_memory_mb:
+        print(f"Only {available_mb:.0f} MB available, releasing loaded models")
+        _release()
+
+
+def release_if_memory_low():
+    """Release every loaded model if available memory is below MinAvailableMemoryMB."""
+    with _lock:
+        _release_under_pressure()
+
+
+def build_batches(lengths, max_batch_tokens=max_batch_tokens):
+    """
+    Group input indices into batches by token length.
+
+    Inputs are sorted shortest first and packed while the padded batch, its
+    longest input times its size, stays within max_batch_tokens.
+    """
+    batches = []
+    current = []
+    for i in sorted(range(len(lengths)), key=lambda i: lengths[i]):
+        # Sorted ascending, so input i is the longest of the batch it joins
+        if current and lengths[i] * (len(current) + 1) > max_batch_tokens:
+            batches.append(current)
+            current = []
+        current.append(i)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def summarize_batched(texts, model_name=DEFAULT_SUMMARIZATION_MODEL, max_batch_tokens=max_batch_tokens, backend=bart_backend, **generate_kwargs):
+    """Summarize texts in length-bucketed batches and return the summaries in input order."""
+    if not texts:
+        return []
+    summarizer = get_summarizer(model_name, backend)
+    encoded = summarizer.tokenizer(list(texts), truncation=True)['input_ids']
+    results = [None] * len(texts)
+    for batch in tqdm(build_batches([len(ids) for ids in encoded], max_batch_tokens), desc="Summarizing batches"):
+        outputs = summarizer([texts[i] for i in batch], batch_size=len(batch), truncation=True, **generate_kwargs)
+        for i, output in zip(batch, outputs):
+            results[i] = output['summary_text']
+    return results
@@ -0,0 +1,104 @@
+import configparser
+import hashlib
+import re
+from modules.scraper import get_full_text, get_stored_article
+
+# Config parser
+config = configparser.ConfigParser()
+config.read('modules/suite_config.ini')
+
+# Thresholds
+MAX_DISTANCE = config.getint('THRESHOLDS', 'NEAR_DUPLICATE_DISTANCE', fallback=3)
+
+SIMHASH_BITS = 64
+SHINGLE_SIZE = 3
+# With MAX_DISTANCE + 1 bands, two signatures within MAX_DISTANCE bits always share a band
+NUM_BANDS = MAX_DISTANCE + 1
+BAND_BITS = SIMHASH_BITS // NUM_BANDS
+
+
+def simhash(text):
+    words = re.findall(r'\w+', text.lower())
+    shingles = [' '.join(words[i:i + SHINGLE_SIZE]) for i in range(max(1, len(words) - SHINGLE_SIZE + 1))]
+    weights = [0] * SIMHASH_BITS
+    for shingle in shingles:
+        value = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+def _bands(signature):
+    mask = (1 << BAND_BITS) - 1
+    return [(band, signature >> (band * BAND_BITS) & mask) for band in range(NUM_BANDS)]
+
+
+def new_index():
+    return {'buckets': {}, 'signatures': {}}
+
+
+def find_duplicate(index, signature):
+    """Return the representative URL whose signature is within MAX_DISTANCE bits, or None."""
+    candidates = set()
+    for band in _bands(signature):
+        candidates.update(index['buckets'].get(band, ()))
+    for url in sorted(candidates):
+        if bin(index['signatures'][url] ^ signature).count('1') <= MAX_DISTANCE:
+            return url
+    return None
+
+
+def add(index, url, signature):
+    index['signatures'][url] = signature
+    for band in _bands(signature):
+        index['buckets'].setdefault(band, []).append(url)
+
+
+def index_articles(urls, index=None):
+    """Add the stored bodies of already-processed articles to the index, so later copies collapse onto them."""
+    if index is None:
+        index = new_index()
+    for url in urls:
+        record = get_stored_article(url)
+        if record is not None and record["cleaned_text"]:
+            add(index, url, simhash(record["cleaned_text"]))
+    return index
+
+
+def collapse_near_duplicates(headlines, index=None, alternates=None):
+    """
+    Keep one headline per story among near-identical article bodies.
+
+    Bodies are compared by SimHash signature through a banded LSH index. The
+    first headline of each cluster is kept, the others are recorded in
+    alternates under its URL as (title, url, source). Pass the same index and
+    alternates to several calls to collapse across batches.
+    """
+    if index is None:
+        index = new_index()
+    if alternates is None:
+        alternates = {}
+    representatives = []
+    for headline in headlines:
+        title, url, timestamp, source = headline
+        # An article indexed by an earlier batch or run is its own representative
+        if url in index['signatures']:
+            representatives.append(headline)
+            continue
+        text = get_full_text(url)
+        if not text:
+            representatives.append(headline)
+            continue
+        signature = simhash(text)
+        duplicate_of = find_duplicate(index, signature)
+        if duplicate_of is not None:
+            print(f"Collapsing near duplicate from {source}: {title}")
+            # The same alternate is met again on every run that loads the saved alternates
+            if url not in [alternate[1] for alternate in alternates.get(duplicate_of, [])]:
+                alternates.setdefault(duplicate_of, []).append((title, url, source))
+            continue
+        add(index, url, signature)
+        representatives.append(headline)
+
+    print(f"Kept {len(representatives)} of {len(headlines)} headlines after collapsing near duplicates")
+    return representatives
@@ -0,0 +1,148 @@
+import configparser
+import queue
+import threading
+import time
+from modules import scraper
+from modules import classifier
+from modules import summarizer
+from modules import dedup
+from modules import near_dupes
+from modules import article_cache
+
+# Load the configuration file
+config = configparser.ConfigParser()
+config.read('modules/suite_config.ini')
+
+# Access variables
+scrape_workers = config.getint('Pipeline', 'ScrapeWorkers', fallback=8)
+classify_workers = config.getint('Pipeline', 'ClassifyWorkers', fallback=4)
+summarize_workers = config.getint('Pipeline', 'SummarizeWorkers', fallback=4)
+queue_size = config.getint('Pipeline', 'QueueSize', fallback=32)
+
+# Marks the end of a stage's input
+_DONE = object()
+
+
+def _run_stage(name, num_workers, inbox, work, outbox=None, downstream_workers=0, batch_size=None):
+    """
+    Start num_workers threads that call work(item, emit) for each item in inbox.
+
+    With batch_size, work is called with a list of up to batch_size items
+    instead: whatever is already queued behind the first one. Once every
+    worker has seen its end marker, one end marker per downstream worker is
+    put on outbox. Errors are printed and only drop the failing item or batch.
+    """
+    finished = []
+    lock = threading.Lock()
+
+    def worker():
+        done = False
+        while not done:
+            item = inbox.get()
+            if item is _DONE:
+                break
+            items = [item]
+            while batch_size is not None and len(items) < batch_size:
+                try:
+                    item = inbox.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _DONE:
+                    done = True
+                    break
+                items.append(item)
+            try:
+                work(items if batch_size is not None else items[0], outbox.put if outbox is not None else None)
+            except Exception as e:
+                print(f"Error in {name} stage: {e}")
+        with lock:
+            finished.append(True)
+            last = len(finished) == num_workers
+        if last:
+            for _ in range(downstream_workers):
+                outbox.put(_DONE)
+
+    threads = [threading.Thread(target=worker, name=f"{name}-{i}", daemon=True) for i in range(num_workers)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def run_pipeline(sources, retries=3, wait_time_seconds=2, accept=None, model=None, alternates=None, near_duplicate_index=None):
+    """
+    Scrape, classify and summarize with each article moving on as soon as it is ready.
+
+    The stages run concurrently and are connected by bounded queues, so a slow
+    stage holds back the ones before it instead of letting work pile up.
+    accept, if given, is called with each deduplicated headline and decides
+    whether it is processed. model is the SentenceTransformer handed to the
+    classifier, and near-duplicate articles are recorded in alternates.
+    near_duplicate_index, if given, already holds articles processed earlier.
+    Summaries are returned in source and feed order.
+    """
+    start_time = time.monotonic()
+    first_summary_time = []
+    feed_state = scraper.load_feed_state()
+    dedup_index = {}
+    if near_duplicate_index is None:
+        near_duplicate_index = near_dupes.new_index()
+    dedup_lock = threading.Lock()
+    results = []
+    results_lock = threading.Lock()
+
+    source_queue = queue.Queue()
+    for i, source in enumerate(sources):
+        source_queue.put((i, source))
+    for _ in range(scrape_workers):
+        source_queue.put(_DONE)
+    classify_queue = queue.Queue(maxsize=queue_size)
+    summarize_queue = queue.Queue(maxsize=queue_size)
+
+    def scrape(item, emit):
+        i, (source, num_articles) = item
+        headlines = scraper.scrape_headlines(source, num_articles, feed_state)
+        with dedup_lock:
+            headlines = dedup.dedup_headlines(headlines, dedup_index)
+        # Load the article bodies outside the lock, the near-duplicate check needs them
+        for headline in headlines:
+            scraper.get_full_text(headline[1])
+        with dedup_lock:
+            headlines = near_dupes.collapse_near_duplicates(headlines, near_duplicate_index, alternates)
+            if accept is not None:
+                headlines = [headline for headline in headlines if accept(headline)]
+        for j, headline in enumerate(headlines):
+            emit(((i, j), headline))
+
+    def classify(items, emit):
+        # Headlines waiting in the queue are classified together in one request
+        categorized_headlines = classifier.categorize_headlines([headline for _, headline in items], batch_size=classifier.batch_size, model=model, save_cache=False)
+        for (key, _), categorized_headline in zip(items, categorized_headlines):
+            emit((key, categorized_headline))
+
+    def summarize(item, emit):
+        key, categorized_headline = item
+        summary = summarizer.summarize_article(categorized_headline, retries, wait_time_seconds)
+        if summary is not None:
+            with results_lock:
+                if not first_summary_time:
+                    first_summary_time.append(time.monotonic() - start_time)
+                results.append((key, summary))
+
+    threads = []
+    threads += _run_stage("scrape", scrape_workers, source_queue, scrape, classify_queue, classify_workers)
+    threads += _run_stage("classify", classify_workers, classify_queue, classify, summarize_queue, summarize_workers, batch_size=max(classifier.batch_size, 1))
+    threads += _run_stage("summarize", summarize_workers, summarize_queue, summarize)
+    for thread in threads:
+        thread.join()
+
+    scraper.save_feed_state(feed_state)
+    # The caches are written once here rather than after every article
+    classifier.save_classification_cache()
+    summarizer.save_summary_cache()
+    article_cache.save()
+    if first_summary_time:
+        print(f"First summary after {first_summary_time[0]:.1f}s")
+    print(f"Pipeline produced {len(results)} summaries in {time.monotonic() - start_time:.1f}s")
+
+    results.sort(key=lambda item: item[0])
+    return [summary for _, summary in results]
@@ -0,0 +1,70 @@
+import asyncio
+import configparser
+import threading
+import time
+
+# Load the configuration file
+config = configparser.ConfigParser()
+config.read('modules/suite_config.ini')
+
+# Access variables
+requests_per_minute = config.getint('RateLimits', 'RequestsPerMinute', fallback=3500)
+tokens_per_minute = config.getint('RateLimits', 'TokensPerMinute', fallback=90000)
+
+
+class RateLimiter:
+    """
+    Token buckets for requests and tokens per minute, shared between threads.
+
+    acquire blocks, and acquire_async awaits, until both buckets can cover the
+    call. Each bucket holds at most one minute's allowance and refills
+    continuously.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.capacity = (float(requests_per_minute), float(tokens_per_minute))
+        self.available = list(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.updated
+        self.updated = now
+        for i, capacity in enumerate(self.capacity):
+            self.available[i] = min(capacity, self.available[i] + elapsed * capacity / 60)
+
+    def _reserve(self, tokens):
+        """Take the allowance for one call if both buckets cover it, otherwise return the seconds to wait."""
+        # A call larger than the whole bucket would never fit, cap it at one minute's worth
+        needed = (1.0, min(float(tokens), self.capacity[1]))
+        with self.lock:
+            self._refill()
+            if all(available >= need for available, need in zip(self.available, needed)):
+                self.available = [available - need for available, need in zip(self.available, needed)]
+                return 0
+            return max((need - available) * 60 / capacity
+                       for available, need, capacity in zip(self.available, needed, self.capacity))
+
+    def acquire(self, tokens=0):
+        while True:
+            wait = self._reserve(tokens)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens=0):
+        while True:
+            wait = self._reserve(tokens)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+
+def estimate_tokens(text, max_tokens=0):
+    # Roughly four tokens for every three English words, plus the completion budget
+    return int(len(text.split()) * 4 / 3) + max_tokens
+
+
+# One limiter for every OpenAI call made by this process
+openai_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
@@ -2,6 +2,14 @@ import requests
 from goose3 import Goose
 import configparser
 import feedparser
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+from modules.cache_files import load_cache, save_cache
+from modules import article_cache
+from modules import llm_cache
 
 # Load the configuration file
 config = configparser.ConfigParser()
@@ -10,32 +18,249 @@ config.read('modules/suite_config.ini')
 # Access variables
 use_tqdm = config.getboolean('General', 'UseTqdm')
 truncate_max_tokens = config.getint('General', 'TruncateMaxTokens')
+max_scrape_workers = config.getint('Scraper', 'MaxWorkers', fallback=16)
+per_host_limit = config.getint('Scraper', 'PerHostLimit', fallback=2)
+scrape_time_budget = config.getint('Scraper', 'TimeBudgetSeconds', fallback=120)
+conditional_get = config.getboolean('Scraper', 'ConditionalGet', fallback=True)
+feed_state_file = config.get('Cache', 'FeedStateFile', fallback='cache/feed_state.pkl')
+# With [LLM] CacheMode = replay the whole run is offline: feeds are served from
+# the recorded feed state and articles from the article cache only
+replay = llm_cache.cache_mode == 'replay'
 
-# Initialize Goose
-g = Goose()
+# Goose instances are not shared between threads, each worker gets its own
+_local = threading.local()
 
-def scrape_headlines(source, num_articles):
-    headlines = []
-    # Parse the RSS feed
+def _goose():
+    if not hasattr(_local, 'goose'):
+        _local.goose = Goose()
+    return _local.goose
+
+# Articles extracted during this run, keyed by both the feed link and the
+# resolved URL, so each article is downloaded and extracted only once
+_article_store = {}
+_store_lock = threading.Lock()
+
+def store_article(url, record):
+    with _store_lock:
+        _article_store[url] = record
+        if record["final_url"]:
+            _article_store[record["final_url"]] = record
+    return record
+
+def get_stored_article(url):
+    """Return the article record for url from this run or the on-disk article cache, or None."""
+    with _store_lock:
+        record = _article_store.get(url)
+    if record is None:
+        record = article_cache.get(url, ignore_age=replay)
+        if record is not None:
+            store_article(url, record)
+    return record
+
+def fetch_article(url):
+    """Return the stored record for url, extracting the article if it hasn't been seen yet."""
+    record = get_stored_article(url)
+    if record is None:
+        if replay:
+            raise LookupError(f"No recorded article for {url}")
+        article = _goose().extract(url=url)
+        record = store_article(url, {
+            "url": url,
+            "final_url": article.final_url,
+            "cleaned_text": (article.cleaned_text or "").strip(),
+            "title": article.title,
+            "publish_date": article.publish_date,
+            "fetched_at": time.time(),
+        })
+        article_cache.put(url, record)
+    return record
+
+def load_feed_state(filename=feed_state_file):
+    if not (conditional_get or replay) or not os.path.exists(filename):
+        return {}
+    try:
+        return load_cache(filename)
+    except Exception as e:
+        print(f"Error while loading feed state: {e}")
+        return {}
+
+def save_feed_state(feed_state, filename=feed_state_file):
+    # A replay leaves the recording as it was
+    if not conditional_get or replay:
+        return
+    os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+    save_cache(filename, feed_state)
+
+def _entry_guids(feed, num_articles):
+    return [entry.get('id', entry.get('link')) for entry in feed.entries[:num_articles]]
+
+def _replayed_headlines(source, num_articles, source_state):
+    if not source_state:
+        print(f"No recorded headlines for {source}, skipping")
+        return []
+    return list(source_state['headlines'][:num_articles])
+
+def _parse_feed(source, num_articles, source_state=None):
     print(source)
-    
-    feed = feedparser.parse(source)
+    # Send the validators from the last run so unchanged feeds answer 304
+    if not source_state or source_state.get('num_articles') != num_articles:
+        return feedparser.parse(source)
+    return feedparser.parse(source, etag=source_state.get('etag'), modified=source_state.get('modified'))
+
+def _unchanged_headlines(feed, num_articles, source_state):
+    """Return the stored headlines if the feed hasn't changed since the last run, otherwise None."""
+    if not source_state or source_state.get('num_articles') != num_articles:
+        return None
+    if feed.get('status') == 304:
+        print("Feed not modified, skipping")
+        return source_state['headlines']
+    if _entry_guids(feed, num_articles) == source_state['guids']:
+        print("Feed entries unchanged, skipping")
+        return source_state['headlines']
+    return None
+
+def _update_feed_state(feed_state, source, feed, num_articles, headlines):
+    # Only remember successful fetches, a failed one has no status or an error status
+    if feed.get('status', 999) >= 400:
+        return
+    feed_state[source] = {
+        'etag': feed.get('etag'),
+        'modified': feed.get('modified'),
+        'num_articles': num_articles,
+        'guids': _entry_guids(feed, num_articles),
+        'headlines': headlines,
+    }
+
+def _extract_headline(entry, source):
+    try:
+        article_title = entry.title
+        article_url = entry.link
+        timestamp = entry.updated_parsed
+        article = fetch_article(article_url)
+
+        return (article_title, article["final_url"], timestamp, source)
+    except Exception as e:
+        print(f"Error while processing article in source {source}: {e}")
+        return None
+
+def scrape_headlines(source, num_articles, feed_state=None):
+    save_state = feed_state is None
+    if save_state:
+        feed_state = load_feed_state()
+    if replay:
+        return _replayed_headlines(source, num_articles, feed_state.get(source))
 
+    # Parse the RSS feed
+    feed = _parse_feed(source, num_articles, feed_state.get(source))
+    headlines = _unchanged_headlines(feed, num_articles, feed_state.get(source))
+    if headlines is not None:
+        return list(headlines)
+
+    headlines = []
     for entry in feed.entries[:num_articles]:
-        try:
-            article_title = entry.title
-            article_url = entry.link
-            timestamp = entry.updated_parsed
-            article = g.extract(url=article_url)
-
-            headlines.append((article_title, article.final_url, timestamp, source))
-        except Exception as e:
-            print(f"Error while processing article in source {source}: {e}")
-            continue
+        headline = _extract_headline(entry, source)
+        if headline is not None:
+            headlines.append(headline)
+
+    _update_feed_state(feed_state, source, feed, num_articles, headlines)
+    if save_state:
+        save_feed_state(feed_state)
+        article_cache.save()
     return headlines
 
+def scrape_all_headlines(sources, max_workers=max_scrape_workers, host_limit=per_host_limit, time_budget=scrape_time_budget):
+    """
+    Scrape every (source, num_articles) pair concurrently.
+
+    Feeds and then articles are fetched on a bounded thread pool with at most
+    host_limit requests in flight per host. Work still outstanding after
+    time_budget seconds is dropped. Headlines come back in the same order as
+    calling scrape_headlines on each source in turn.
+    """
+    deadline = time.monotonic() + time_budget
+    feed_state = load_feed_state()
+    if replay:
+        return [headline for source, num_articles in sources for headline in _replayed_headlines(source, num_articles, feed_state.get(source))]
+    host_semaphores = {}
+    host_lock = threading.Lock()
+
+    def remaining():
+        return max(0, deadline - time.monotonic())
+
+    def limited(url, fn, *args):
+        host = urlparse(url or '').netloc.lower()
+        with host_lock:
+            semaphore = host_semaphores.setdefault(host, threading.Semaphore(host_limit))
+        with semaphore:
+            if time.monotonic() > deadline:
+                return None
+            return fn(*args)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        feed_futures = {executor.submit(limited, source, _parse_feed, source, num_articles, feed_state.get(source)): i for i, (source, num_articles) in enumerate(sources)}
+        done, not_done = wait(feed_futures, timeout=remaining())
+        for future in not_done:
+            print(f"Time budget exceeded while fetching feed: {sources[feed_futures[future]][0]}")
+
+        results = []
+        feeds = {}
+        article_futures = {}
+        for future in done:
+            i = feed_futures[future]
+            source, num_articles = sources[i]
+            try:
+                feed = future.result()
+            except Exception as e:
+                print(f"Error while fetching feed {source}: {e}")
+                continue
+            if feed is None:
+                continue
+            unchanged = _unchanged_headlines(feed, num_articles, feed_state.get(source))
+            if unchanged is not None:
+                results.extend(((i, j), headline) for j, headline in enumerate(unchanged))
+                continue
+            feeds[i] = feed
+            for j, entry in enumerate(feed.entries[:num_articles]):
+                future = executor.submit(limited, entry.get('link'), _extract_headline, entry, source)
+                article_futures[future] = (i, j)
+
+        done, not_done = wait(article_futures, timeout=remaining())
+        if not_done:
+            print(f"Time budget exceeded, dropping {len(not_done)} unfinished articles")
+
+        scraped = {i: [] for i in feeds}
+        for future in done:
+            headline = future.result()
+            if headline is not None:
+                scraped[article_futures[future][0]].append((article_futures[future], headline))
+        incomplete = {article_futures[future][0] for future in not_done}
+        for i, source_results in scraped.items():
+            source_results.sort(key=lambda item: item[0])
+            results.extend(source_results)
+            # Don't remember a source whose articles were cut off by the time budget
+            if i not in incomplete:
+                source, num_articles = sources[i]
+                _update_feed_state(feed_state, source, feeds[i], num_articles, [headline for _, headline in source_results])
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    save_feed_state(feed_state)
+    article_cache.save()
+
+    results.sort(key=lambda item: item[0])
+    return [headline for _, headline in results]
+
 def get_full_text(url):
     try:
+        # Articles extracted while scraping or in earlier runs are served from the store
+        record = get_stored_article(url)
+        if record is not None:
+            return record["cleaned_text"]
+        if replay:
+            print(f"No recorded article for {url}")
+            return ""
+
         if 'news.google.com' in url:
             # Use allow_redirects=True to follow redirects automatically
             response = requests.get(url, allow_redirects=True)
@@ -45,14 +270,7 @@ def get_full_text(url):
         elif 'ycombinator.com' in url:  # Add this line to handle Hacker News specific case
             return ""
 
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_14_6) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/78.0.3904.97 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers)
-        article = g.extract(url=url)  
-     
-        
-        return article.cleaned_text.strip()
+        return fetch_article(url)["cleaned_text"]
 
     except (requests.RequestException, TypeError, ValueError, Exception) as e:
         print(f"Error fetching the URL: {url} - {e}")
@@ -64,3 +282,4 @@ def truncate_text(text, max_tokens=truncate_max_tokens):
         return " ".join(tokens[:max_tokens])
     else:
         return text
+
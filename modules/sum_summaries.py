@@ -6,6 +6,7 @@ import openai
 from datetime import datetime, timedelta
 from modules.summarizer import summarize_super_summary
 from modules.errors import robust_api_call
+from modules import llm_client
 config = configparser.ConfigParser()
 config.read('modules/suite_config.ini')
 
@@ -87,7 +88,8 @@ def generate_gpt_completion(prompt, api_key, model=super_summary_model, max_toke
         latest_super_summary_text = summarize_super_summary(latest_super_summary_content)
         prompt.append((". Moving on to the summary of the previous hour's events:", "", latest_super_summary_text, "", "", "")) 
     try:
-        response = robust_api_call(lambda: openai.ChatCompletion.create(
+        response = robust_api_call(lambda: llm_client.chat_completion(
+            stage="super_summary",
             model=model,
             messages=[
                 {
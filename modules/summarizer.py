@@ -3,11 +3,16 @@ import openai
 from datetime import datetime
 import os
 from modules.errors import robust_api_call
+from modules import llm_client
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
 from modules.scraper import truncate_text, get_full_text
-from transformers import BartForConditionalGeneration, BartTokenizer, pipeline
+from modules.condensed_cache import condense_summaries
+from modules import article_cache
+import hashlib
 import pickle
-import torch
+import threading
+import time
 
 # Load the configuration file
 config = configparser.ConfigParser()
@@ -20,40 +25,129 @@ summarize_articles_model = config['Models']['SummarizeArticles']
 summarize_super_summary_model = config['Models']['SummarizeSuperSummary']
 cache_file = config['Cache']['DailyCacheFile']
 categories_order = config.get('Headlines', 'Categories').split(', ')
+summarize_workers = config.getint('Summaries', 'MaxWorkers', fallback=1)
+summary_cache_file = config.get('Cache', 'SummaryCacheFile', fallback='cache/summary_cache.pkl')
+summary_cache_max_age_hours = config.getint('Summaries', 'SummaryCacheMaxAgeHours', fallback=72)
+
+# Bump whenever the article summary prompt or parameters change so stale summaries are not reused
+SUMMARY_PROMPT_VERSION = 1
 
 openai.api_key = openai_api_key
 
-def summarize_articles(categorized_headlines, retries=3, wait_time_seconds=2):
-    summaries = []
-    for headline, category, url, timestamp, source in tqdm(categorized_headlines):
-        full_text = get_full_text(url)
-        truncated_full_text = truncate_text(full_text)
-        if truncated_full_text:
-            # Prepare the prompt for GPT-3.5-turbo
-            prompt = f"Please provide a neutral and concise summary of the following text, focusing on the salient information. Avoid including minor details or background information that doesn't contribute directly to the central message or main events. Remain objective and refrain from including personal opinion or bias:\n\n{truncated_full_text}\n"
-
-            # Print additional info for debugging
-            print(f"Headline: {headline}")
-            print(f"Prompt: {prompt}")
-
-            # Generate the summary
-            response = robust_api_call(lambda: openai.ChatCompletion.create(
-                model=summarize_articles_model,
-                messages=[
-                    {"role": "system", "content": "You are an AI tasked with summarizing news articles in a professional manner"},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=180, # Summary Length
-                request_timeout = 30                
-            ), retries=retries, base_delay=wait_time_seconds)
-
-            if response is not None:
-                summary = response['choices'][0]['message']['content']
-                summaries.append((headline, category, summary, url, timestamp, source))
-            else:
-                print(f"Failed to generate summary for {headline} after all retries. Skipping...")
+# Hash of the truncated text, model and prompt version -> (summary, time it was generated)
+_summary_cache = None
+_summary_cache_dirty = False
+_summary_cache_lock = threading.Lock()
+
+def _summary_key(truncated_full_text):
+    key = f"{summarize_articles_model}\n{SUMMARY_PROMPT_VERSION}\n{truncated_full_text}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+def _load_summary_cache():
+    global _summary_cache
+    if _summary_cache is None:
+        _summary_cache = {}
+        if os.path.exists(summary_cache_file):
+            try:
+                with open(summary_cache_file, 'rb') as f:
+                    _summary_cache = pickle.load(f)
+            except Exception as e:
+                print(f"Error while loading summary cache: {e}")
+    return _summary_cache
+
+def get_cached_summary(truncated_full_text):
+    with _summary_cache_lock:
+        cached = _load_summary_cache().get(_summary_key(truncated_full_text))
+    if cached is None or time.time() - cached[1] > summary_cache_max_age_hours * 3600:
+        return None
+    return cached[0]
+
+def cache_summary(truncated_full_text, summary):
+    # Kept in memory until save_summary_cache, so workers don't queue up behind disk writes
+    global _summary_cache_dirty
+    with _summary_cache_lock:
+        _load_summary_cache()[_summary_key(truncated_full_text)] = (summary, time.time())
+        _summary_cache_dirty = True
+
+def save_summary_cache():
+    global _summary_cache_dirty
+    with _summary_cache_lock:
+        if not _summary_cache_dirty:
+            return
+        cache = _load_summary_cache()
+        # Evict summaries older than the maximum age
+        cutoff = time.time() - summary_cache_max_age_hours * 3600
+        for key in [key for key, (_, created) in cache.items() if created < cutoff]:
+            del cache[key]
+        os.makedirs(os.path.dirname(summary_cache_file) or '.', exist_ok=True)
+        with open(summary_cache_file, 'wb') as f:
+            pickle.dump(cache, f)
+        _summary_cache_dirty = False
+
+def summarize_article(categorized_headline, retries=3, wait_time_seconds=2):
+    headline, category, url, timestamp, source = categorized_headline
+    full_text = get_full_text(url)
+    truncated_full_text = truncate_text(full_text)
+    if truncated_full_text:
+        # Unchanged text gets the summary generated for it earlier
+        summary = get_cached_summary(truncated_full_text)
+        if summary is not None:
+            print(f"Using cached summary for: {headline}")
+            return (headline, category, summary, url, timestamp, source)
+
+        # Prepare the prompt for GPT-3.5-turbo
+        prompt = f"Please provide a neutral and concise summary of the following text, focusing on the salient information. Avoid including minor details or background information that doesn't contribute directly to the central message or main events. Remain objective and refrain from including personal opinion or bias:\n\n{truncated_full_text}\n"
+
+        # Print additional info for debugging
+        print(f"Headline: {headline}")
+        print(f"Prompt: {prompt}")
+
+        # Generate the summary
+        response = robust_api_call(lambda: llm_client.chat_completion(
+            stage="summarize",
+            model=summarize_articles_model,
+            messages=[
+                {"role": "system", "content": "You are an AI tasked with summarizing news articles in a professional manner"},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=180, # Summary Length
+            request_timeout = 30                
+        ), retries=retries, base_delay=wait_time_seconds)
+
+        if response is not None:
+            summary = response['choices'][0]['message']['content']
+            cache_summary(truncated_full_text, summary)
+            return (headline, category, summary, url, timestamp, source)
         else:
-            print(f"Could not extract full text for: {headline}")
+            print(f"Failed to generate summary for {headline} after all retries. Skipping...")
+    else:
+        print(f"Could not extract full text for: {headline}")
+    return None
+
+def _summarize_isolated(categorized_headline, retries, wait_time_seconds):
+    # An unexpected error only loses this article, not the whole run
+    try:
+        return summarize_article(categorized_headline, retries, wait_time_seconds)
+    except Exception as e:
+        print(f"Error while summarizing {categorized_headline[0]}: {e}")
+        return None
+
+def summarize_articles(categorized_headlines, retries=3, wait_time_seconds=2, max_workers=summarize_workers):
+    if max_workers > 1:
+        # Requests run concurrently through the shared LLM client, results keep the input order
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(tqdm(executor.map(lambda categorized_headline: _summarize_isolated(categorized_headline, retries, wait_time_seconds), categorized_headlines), total=len(categorized_headlines)))
+        save_summary_cache()
+        article_cache.save()
+        return [summary for summary in results if summary is not None]
+
+    summaries = []
+    for categorized_headline in tqdm(categorized_headlines):
+        summary = _summarize_isolated(categorized_headline, retries, wait_time_seconds)
+        if summary is not None:
+            summaries.append(summary)
+    save_summary_cache()
+    article_cache.save()
     return summaries
 
 def organize_summaries_by_category(summaries):
@@ -75,7 +169,8 @@ def summarize_super_summary(super_summary_text):
     if truncated_text:
         prompt = f"Please provide a neutral and concise summary of the following text, focusing on key points and isolating the most important information. Avoid including minor details or background information that doesn't contribute directly to the central message or main events. Remain objective and refrain from including personal opinion or bias:\n\n{truncated_text}\n"
 
-        response = robust_api_call(lambda: openai.ChatCompletion.create(
+        response = robust_api_call(lambda: llm_client.chat_completion(
+            stage="super_summary",
             model=summarize_super_summary_model,
             messages=[
                 {"role": "system", "content": "You are tasked with summarizing a news briefing for the hour."},
@@ -110,11 +205,8 @@ def save_super_summary(super_summary):
         file.write(super_summary)
 
  
-def summarize_daily_cache(cache_file, batch_size=10):
+def summarize_daily_cache(cache_file):
     print("Summarizing Daily cache with BART")
-    os.environ["CUDA_VISIBLE_DEVICES"] = "0"  # Replace '0' with the GPU index you want to use
-    # Check if GPU is available and use GPU:0 (if available)
-    device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
     try:
         # Check if the cache file exists
         if not os.path.exists(cache_file):
@@ -125,26 +217,12 @@ def summarize_daily_cache(cache_file, batch_size=10):
         with open(cache_file, 'rb') as f:
             daily_cache = pickle.load(f)
 
-        # Initialize the tokenizer and model
-        model_name = 'facebook/bart-large-cnn'
-        tokenizer = BartTokenizer.from_pretrained(model_name)
-        model = BartForConditionalGeneration.from_pretrained(model_name).to(device)
-
-        # Initialize the summarization pipeline
-        summarizer = pipeline('summarization', model=model, tokenizer=tokenizer, device=0 if torch.cuda.is_available() else -1)
-
-        # Summarize each summary individually
-        summarized_summaries = []
-        for i in tqdm(range(0, len(daily_cache), batch_size), desc="Processing summaries"):
-                batch = daily_cache[i:i+batch_size]
-                headlines = [summary[0] for summary in batch]  # assuming the headline is at index 0
-                texts = [summary[2] for summary in batch]  # assuming the summary is at index 2
-
-                summaries = summarizer(texts, max_length=45, min_length=10, do_sample=False)
+        headlines = [summary[0] for summary in daily_cache]  # assuming the headline is at index 0
+        texts = [summary[2] for summary in daily_cache]  # assuming the summary is at index 2
 
-                for j, summary in enumerate(summaries):
-                    summarized_summaries.append((headlines[j], summary['summary_text']))
+        # Only summaries not condensed in an earlier run go through BART
+        summaries = condense_summaries(texts, max_length=45, min_length=10)
 
-        return summarized_summaries
+        return list(zip(headlines, summaries))
     except Exception as e:
         print(f"Error while summarizing daily cache: {e}")
@@ -6,6 +6,7 @@ import os
 from datetime import datetime
 from .summarizer import summarize_super_summary, save_super_summary
 from .errors import robust_api_call
+from . import llm_client
 
 # Load the configuration file
 config = configparser.ConfigParser()
@@ -58,7 +59,8 @@ def get_super_summary():
         print(gpt_input)
         # Use gpt-3.5-turbo-16k as the model
     try:
-        response = robust_api_call(lambda: openai.ChatCompletion.create(
+        response = robust_api_call(lambda: llm_client.chat_completion(
+            stage="super_summary",
             model=get_super_summary_model,
             messages=[
                     {
@@ -86,7 +88,7 @@ def get_super_summary():
                     }
                 ],
             max_tokens=700
-        ), retries=3, delay=2, rate_limit_delay=10)
+        ), retries=3, base_delay=2)
     except Exception as e:
         print(f"Error while generating super summary: {e}")
         return 'Failed to generate the super summary', 500
@@ -0,0 +1,25 @@
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Query parameters that only identify the campaign or referrer, never the article
+TRACKING_PARAMS = {'fbclid', 'gclid', 'dclid', 'msclkid', 'mc_cid', 'mc_eid', 'ocid', 'cmpid', 'ref', 'ref_src', 'taid', 'ito', 'guccounter', 'guce_referrer', 'guce_referrer_sig', 'soc_src', 'soc_trk'}
+TRACKING_PREFIXES = ('utm_', 'at_', 'itm_', 'pk_')
+
+def strip_tracking(url):
+    parts = urlsplit(url.strip())
+    params = parse_qsl(parts.query, keep_blank_values=True)
+    kept = [(key, value) for key, value in params
+            if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)]
+    query = parts.query if len(kept) == len(params) else urlencode(kept)
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, query, ''))
+
+def canonical_url(url):
+    """Normalize url into the key used to recognise the same article across sources."""
+    parts = urlsplit(strip_tracking(url))
+    host = parts.hostname or ''
+    if host.startswith('www.'):
+        host = host[len('www.'):]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip('/') or '/'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit(('https' if parts.scheme in ('http', 'https') else parts.scheme, host, path, query, ''))
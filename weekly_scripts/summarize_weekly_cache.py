@@ -1,13 +1,14 @@
-from transformers import BartForConditionalGeneration, BartTokenizer, pipeline
 import pickle
 import os
-from tqdm import tqdm
+import re
+import sys
 import json
 import torch
 from datetime import datetime
-os.environ["CUDA_VISIBLE_DEVICES"] = "0"  # Replace '0' with the GPU index you want to use
-# Check if GPU is available and use GPU:0 (if available)
-device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules import model_registry
+from modules.condensed_cache import condense_summaries
 
 if torch.cuda.is_available():
     print("CUDA is available. GPU(s) are accessible.")
@@ -32,81 +33,90 @@ def summarize_weekly_cache(cache_file='cache/test_weekly_cache.pkl'):
         current_week_number = datetime.now().isocalendar()[1]
         weekly_cache = cache.get(current_week_number, {})
 
-        # Initialize the tokenizer and model
-        model_name = 'facebook/bart-large-cnn'
-        tokenizer = BartTokenizer.from_pretrained(model_name)
-        model = BartForConditionalGeneration.from_pretrained(model_name).to(device)
+        # Create a list of the days you want to include in your summarization
+        days_to_include = ["Saturday", "Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+        days = [day for day in days_to_include if day in weekly_cache]
 
-        # Initialize the summarization pipeline
-        summarizer = pipeline('summarization', model=model, tokenizer=tokenizer, device=0 if torch.cuda.is_available() else -1)
+        # Condense the whole week's summaries in one length-bucketed pass,
+        # summaries condensed by an earlier run are taken from the cache
+        texts = [summary[2] for day in days for summary in weekly_cache[day]]
+        condensed = condense_summaries(texts, max_length=30, min_length=10)
 
-        # Create a dictionary to hold the summarized summaries
+        # Regroup the results by day, in the same order as the cache
         summarized_summaries = {}
+        position = 0
+        for day in days:
+            count = len(weekly_cache[day])
+            summarized_summaries[day] = condensed[position:position + count]
+            position += count
 
-        # Create a list of the days you want to include in your summarization
-        days_to_include = ["Saturday", "Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
-
-        # Iterate over the days of the week
-        for day in tqdm(days_to_include, desc="Processing days"):
-            # Check if there's data for this day in the cache
-            if day not in weekly_cache:
-                continue
+        return summarized_summaries
+    except Exception as e:
+        print(f"Error while summarizing weekly cache: {e}")
 
-            summaries = weekly_cache[day]
+    
 
-            # Initialize a list to hold the summarized summaries for this day
-            day_summaries = []
 
-            # Summarize each summary individually
-            for summary in tqdm(summaries, desc=f"Processing summaries for {day}", leave=False):
-                # Extract the summary from the tuple
-                text = summary[2]
+# Room left in BART's input window for the special tokens
+WINDOW_MARGIN = 8
+MAX_REDUCE_LEVELS = 5
 
-                # Generate a summary of the summary
-                summary = summarizer(text, max_length=30, min_length=10, do_sample=False)
 
-                # Add the summary to the list
-                day_summaries.append(summary[0]['summary_text'])
+def split_sentences(text):
+    return [sentence for sentence in re.split(r'(?<=[.!?])\s+', text) if sentence.strip()]
 
-            # Save the list of summarized summaries for this day in the dictionary
-            summarized_summaries[day] = day_summaries
 
-        return summarized_summaries
-    except Exception as e:
-        print(f"Error while summarizing weekly cache: {e}")
+def chunk_sentences(sentences, tokenizer, max_tokens):
+    """
+    Pack whole sentences into chunks of at most max_tokens tokens.
 
-    
+    A sentence that is longer than max_tokens on its own is split into
+    consecutive windows of max_tokens tokens, each its own chunk.
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+    for sentence in sentences:
+        ids = tokenizer.encode(sentence, add_special_tokens=False)
+        if current and current_tokens + len(ids) > max_tokens:
+            chunks.append(' '.join(current))
+            current = []
+            current_tokens = 0
+        if len(ids) > max_tokens:
+            chunks.extend(tokenizer.decode(ids[start:start + max_tokens]) for start in range(0, len(ids), max_tokens))
+            continue
+        current.append(sentence)
+        current_tokens += len(ids)
+    if current:
+        chunks.append(' '.join(current))
+    return chunks
 
 
 def summarize_day_summaries(summaries, max_length=300, min_length=200, model_name='facebook/bart-large-cnn'):
     """
     Function to summarize a list of summaries for a day into a single summary for the whole day.
-    """
-    # Initialize the tokenizer and model
-    tokenizer = BartTokenizer.from_pretrained(model_name)
-    model = BartForConditionalGeneration.from_pretrained(model_name).to(device)
 
-    # Initialize the summarization pipeline
-    summarizer = pipeline('summarization', model=model, tokenizer=tokenizer, device=0 if torch.cuda.is_available() else -1)
-
-    # Join the summaries into one string
-    text = ' '.join(summaries)
-
-    # Divide the text into chunks of approximately 10000 characters each
-    chunks = [text[i:i+4000] for i in range(0, len(text), 4000)]
+    The summaries are packed at sentence boundaries into chunks that fit BART's
+    input window. The chunks are summarized in batches, and the chunk summaries
+    are chunked and summarized again until a single summary is left.
+    """
+    # Reuse the pipeline already loaded for this model
+    tokenizer = model_registry.get_summarizer(model_name).tokenizer
+    max_tokens = min(tokenizer.model_max_length, 1024) - WINDOW_MARGIN
 
-    # Initialize a list to hold the summaries of the chunks
-    chunk_summaries = []
+    chunks = chunk_sentences([sentence for summary in summaries for sentence in split_sentences(summary)], tokenizer, max_tokens)
+    if not chunks:
+        return ""
 
-    # Summarize each chunk and add the summary to the list
-    for chunk in chunks:
-        chunk_summary = summarizer(chunk, max_length=max_length, min_length=min_length, do_sample=False)
-        chunk_summaries.append(chunk_summary[0]['summary_text'])
+    for level in range(MAX_REDUCE_LEVELS):
+        chunk_summaries = model_registry.summarize_batched(chunks, model_name=model_name, max_length=max_length, min_length=min_length, do_sample=False)
+        if len(chunk_summaries) == 1:
+            return chunk_summaries[0]
+        print(f"Reducing {len(chunk_summaries)} chunk summaries (level {level + 1})")
+        chunks = chunk_sentences([sentence for summary in chunk_summaries for sentence in split_sentences(summary)], tokenizer, max_tokens)
 
     # Combine the chunk summaries into one string
-    summary = ' '.join(chunk_summaries)
-
-    return summary
+    return ' '.join(chunk_summaries)
 
 
 def main():
@@ -117,6 +127,8 @@ def main():
         day_summary = summarize_day_summaries(summaries)
         summarized_summaries[day] = {"Summaries": summaries, "Summary of the day": day_summary}
 
+    model_registry.release()
+
     # Save the summarized summaries to a file
     with open('weekly_scripts/final_weekly_summaries.json', 'w', encoding='utf-8') as f:
         json.dump(summarized_summaries, f, indent=4, ensure_ascii=False)